@@ -1,14 +1,21 @@
 import streamlit as st
-from utils.db import init_db
+from utils.db import get_con
 from utils.auth import login, is_logged, render_userbox, current_role, logout
+from utils.ui import DASHBOARD_HTML
 import os
 
-# Intentar importar Microsoft Auth (opcional)
-try:
-    from utils.microsoft_auth import microsoft_login_flow, render_microsoft_login_button, add_admins_from_codes
-    MICROSOFT_AVAILABLE = True
-except ImportError:
-    MICROSOFT_AVAILABLE = False
+
+def _load_microsoft_auth():
+    """
+    Importa utils.microsoft_auth (opcional) sólo cuando se necesita.
+    Devuelve el módulo o None si no está disponible.
+    """
+    try:
+        from utils import microsoft_auth
+        return microsoft_auth
+    except ImportError:
+        return None
+
 
 st.set_page_config(
     page_title="Inicio",
@@ -16,21 +23,26 @@ st.set_page_config(
     layout="wide"
 )
 
-# Agregar administradores desde .env al iniciar
-if MICROSOFT_AVAILABLE:
-    admins_env = os.getenv("MICROSOFT_ADMIN_STUDENTS", "")
-    if admins_env:
-        codes = [c.strip() for c in admins_env.split(",") if c.strip()]
-        add_admins_from_codes(codes)
-
-init_db()
+get_con()  # inicializa la BD una vez por proceso
 render_userbox()
 
 st.title(":material/home: Inicio")
 
-# Manejar flujo de Microsoft OAuth si está disponible
+# Microsoft Auth sólo hace falta mientras no haya sesión (login o callback OAuth)
+ms_auth = None if is_logged() else _load_microsoft_auth()
+MICROSOFT_AVAILABLE = ms_auth is not None
+
 if MICROSOFT_AVAILABLE:
-    microsoft_login_flow()
+    # Agregar administradores desde .env (una sola vez por sesión)
+    if not st.session_state.get("_ms_admins_loaded"):
+        admins_env = os.getenv("MICROSOFT_ADMIN_STUDENTS", "")
+        if admins_env:
+            codes = [c.strip() for c in admins_env.split(",") if c.strip()]
+            ms_auth.add_admins_from_codes(codes)
+        st.session_state["_ms_admins_loaded"] = True
+
+    # Manejar flujo de Microsoft OAuth
+    ms_auth.microsoft_login_flow()
 
 if not is_logged():
     st.markdown("## :material/lock: Bienvenido al Sistema de Gestión de Horas de Extensión")
@@ -51,7 +63,7 @@ if not is_logged():
             st.markdown("### Inicia sesión con tu cuenta institucional")
             st.caption("Usa tu correo @uvg.edu.gt")
             
-            render_microsoft_login_button()
+            ms_auth.render_microsoft_login_button()
             
             st.divider()
             st.warning(":material/info: **Importante**: Solo usuarios con correo institucional de la UVG")
@@ -113,60 +125,6 @@ else:
     st.markdown("### :material/explore: ¿Qué puedes hacer?")
     
     # Mostrar opciones según el rol
-    if rol == 'Estudiante':
-        col1, col2 = st.columns(2)
-        with col1:
-            st.markdown("""
-            <div style="padding: 20px; background-color: #e8f5e9; border-radius: 10px; border-left: 4px solid #4caf50;">
-                <h4><span class="material-symbols-outlined" style="vertical-align: middle;">edit_note</span> Registrar Horas</h4>
-                <p>Ve a <b>Registros</b> para reportar tus horas de extensión</p>
-            </div>
-            """, unsafe_allow_html=True)
-        with col2:
-            st.markdown("""
-            <div style="padding: 20px; background-color: #e3f2fd; border-radius: 10px; border-left: 4px solid #2196f3;">
-                <h4><span class="material-symbols-outlined" style="vertical-align: middle;">analytics</span> Ver Estado</h4>
-                <p>Consulta tus horas validadas y pendientes</p>
-            </div>
-            """, unsafe_allow_html=True)
-    
-    elif rol in ['Empresa', 'Departamento', 'Docente']:
-        col1, col2 = st.columns(2)
-        with col1:
-            st.markdown("""
-            <div style="padding: 20px; background-color: #e3f2fd; border-radius: 10px; border-left: 4px solid #2196f3;">
-                <h4><span class="material-symbols-outlined" style="vertical-align: middle;">verified</span> Validar Registros</h4>
-                <p>Ve a <b>Validación</b> para aprobar registros pendientes</p>
-            </div>
-            """, unsafe_allow_html=True)
-        with col2:
-            st.markdown("""
-            <div style="padding: 20px; background-color: #fff3e0; border-radius: 10px; border-left: 4px solid #ff9800;">
-                <h4><span class="material-symbols-outlined" style="vertical-align: middle;">list_alt</span> Ver Registros</h4>
-                <p>Consulta todos los registros del sistema</p>
-            </div>
-            """, unsafe_allow_html=True)
-    
-    elif rol == 'Admin':
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.markdown("""
-            <div style="padding: 20px; background-color: #e8f5e9; border-radius: 10px; border-left: 4px solid #4caf50;">
-                <h4><span class="material-symbols-outlined" style="vertical-align: middle;">groups</span> Alumnos</h4>
-                <p>Gestionar catálogo de alumnos</p>
-            </div>
-            """, unsafe_allow_html=True)
-        with col2:
-            st.markdown("""
-            <div style="padding: 20px; background-color: #e3f2fd; border-radius: 10px; border-left: 4px solid #2196f3;">
-                <h4><span class="material-symbols-outlined" style="vertical-align: middle;">domain</span> Lugares</h4>
-                <p>Gestionar empresas y lugares</p>
-            </div>
-            """, unsafe_allow_html=True)
-        with col3:
-            st.markdown("""
-            <div style="padding: 20px; background-color: #fff3e0; border-radius: 10px; border-left: 4px solid #ff9800;">
-                <h4><span class="material-symbols-outlined" style="vertical-align: middle;">check_box</span> Validación</h4>
-                <p>Aprobar registros pendientes</p>
-            </div>
-            """, unsafe_allow_html=True)
\ No newline at end of file
+    dashboard_html = DASHBOARD_HTML.get(rol)
+    if dashboard_html:
+        st.html(dashboard_html)
@@ -1,5 +1,5 @@
 import streamlit as st
-from utils.db import insert_lugar, list_lugares, soft_delete_lugar, restore_lugar
+from utils.db import insert_lugar, list_lugares, soft_delete_lugares_bulk, restore_lugares_bulk
 from utils.auth import require_login, render_userbox, current_user
 
 st.set_page_config(
@@ -13,6 +13,21 @@ require_login()
 
 st.title(":material/domain: Lugares")
 
+
+# Callbacks de los botones masivos: corren antes del rerun que provoca el clic,
+# así la página ya se dibuja con el catálogo actualizado (sin st.rerun extra).
+def _desactivar_seleccionados():
+    soft_delete_lugares_bulk(st.session_state.get("sel_baja", []), usuario=current_user())
+    st.session_state["sel_baja"] = []
+    st.session_state["_flash"] = "Lugares desactivados."
+
+
+def _restaurar_seleccionados():
+    restore_lugares_bulk(st.session_state.get("sel_rest", []), usuario=current_user())
+    st.session_state["sel_rest"] = []
+    st.session_state["_flash"] = "Lugares restaurados."
+
+
 with st.form("form_lugar", clear_on_submit=True):
     nombre = st.text_input("Nombre del lugar / empresa")
     submitted = st.form_submit_button(":material/add: Agregar lugar")
@@ -28,28 +43,28 @@ st.divider()
 mostrar_inactivos = st.checkbox("Mostrar inactivos", value=False)
 df = list_lugares(incluir_inactivos=mostrar_inactivos)
 st.subheader("Listado")
+flash = st.session_state.pop("_flash", None)
+if flash:
+    st.success(flash)
 if df.empty:
     st.info("No hay lugares.")
 else:
     st.dataframe(df, use_container_width=True)
+    # Máscara de activos calculada una sola vez para ambos selectores
+    activo_mask = df['activo'].to_numpy(dtype=bool)
+    ids = df['id'].to_numpy()
     c1, c2 = st.columns(2)
     with c1:
-        sel_baja = st.multiselect(
+        st.multiselect(
             "Selecciona IDs para desactivar", 
-            df[df['activo']==True]['id'].tolist()
+            ids[activo_mask].tolist(),
+            key="sel_baja"
         )
-        if st.button(":material/delete: Desactivar seleccionados"):
-            for i in sel_baja:
-                soft_delete_lugar(int(i), usuario=current_user())
-            st.success("Lugares desactivados.")
-            st.rerun()
+        st.button(":material/delete: Desactivar seleccionados", on_click=_desactivar_seleccionados)
     with c2:
-        sel_rest = st.multiselect(
+        st.multiselect(
             "Selecciona IDs para restaurar", 
-            df[df['activo']==False]['id'].tolist()
+            ids[~activo_mask].tolist(),
+            key="sel_rest"
         )
-        if st.button(":material/restore: Restaurar seleccionados"):
-            for i in sel_rest:
-                restore_lugar(int(i), usuario=current_user())
-            st.success("Lugares restaurados.")
-            st.rerun()
\ No newline at end of file
+        st.button(":material/restore: Restaurar seleccionados", on_click=_restaurar_seleccionados)
@@ -1,6 +1,7 @@
 import streamlit as st
+import pandas as pd
 from datetime import date
-from utils.db import list_alumnos, list_lugares, insert_registro, list_registros
+from utils.db import list_alumnos, list_lugares, insert_registro, list_registros, list_registros_todos
 from utils.auth import require_login, render_userbox, current_role, current_alumno_id, current_user
 
 st.set_page_config(
@@ -14,7 +15,27 @@ require_login()
 
 st.title(":material/app_registration: Registros")
 
+
+def _hash_df(df: pd.DataFrame) -> bytes:
+    """Huella del contenido (columnas + filas) para usar como clave de caché."""
+    return repr(tuple(df.columns)).encode() + pd.util.hash_pandas_object(df, index=True).values.tobytes()
+
+
+# El CSV sólo se regenera cuando cambia el contenido del DataFrame (caché acotada en tamaño y tiempo)
+@st.cache_data(ttl=60, max_entries=16, show_spinner=False, hash_funcs={pd.DataFrame: _hash_df})
+def _csv_bytes(df: pd.DataFrame) -> bytes:
+    return df.to_csv(index=False).encode('utf-8-sig')
+
+
+# Opciones de selectbox: id -> "id - nombre", una vez por versión del catálogo
+@st.cache_data(ttl=60, max_entries=16, show_spinner=False, hash_funcs={pd.DataFrame: _hash_df})
+def _opciones(df: pd.DataFrame) -> dict:
+    return {int(i): f"{i} - {n}" for i, n in zip(df['id'], df['nombre'])}
+
+
+# Datos de sesión leídos una vez por rerun
 rol = current_role()
+aid = current_alumno_id()
 # Cargar catálogos
 alumnos = list_alumnos()
 lugares = list_lugares()
@@ -22,30 +43,29 @@ lugares = list_lugares()
 if alumnos.empty or lugares.empty:
     st.warning("Debes tener al menos un alumno y un lugar para crear registros.")
 else:
+    alumno_opts = _opciones(alumnos)
     with st.form("form_registro", clear_on_submit=True):
         c1, c2 = st.columns(2)
         if rol == 'Estudiante':
-            aid = current_alumno_id()
             if not aid:
                 st.error("Tu cuenta no está vinculada a un alumno. Contacta al administrador.")
                 st.stop()
             # Mostrar sólo su propio alumno (bloqueado)
-            alumno_label = alumnos[alumnos['id']==aid]['nombre'].iloc[0] if (alumnos['id']==aid).any() else f"ID {aid}"
-            c1.text_input("Alumno", value=f"{aid} - {alumno_label}", disabled=True)
+            c1.text_input("Alumno", value=alumno_opts.get(int(aid), f"{aid} - ID {aid}"), disabled=True)
             alumno_id = aid
         else:
             with c1:
-                alumno_row = st.selectbox(
+                alumno_id = st.selectbox(
                     "Alumno", 
-                    alumnos.to_dict("records"), 
-                    format_func=lambda r: f"{r['id']} - {r['nombre']}"
+                    list(alumno_opts), 
+                    format_func=alumno_opts.get
                 )
-                alumno_id = alumno_row['id']
         with c2:
-            lugar_row = st.selectbox(
+            lugar_opts = _opciones(lugares)
+            lugar_id = st.selectbox(
                 "Lugar", 
-                lugares.to_dict("records"), 
-                format_func=lambda r: f"{r['id']} - {r['nombre']}"
+                list(lugar_opts), 
+                format_func=lugar_opts.get
             )
         actividad = st.text_input("Actividad")
         c3, c4, c5 = st.columns(3)
@@ -64,7 +84,7 @@ else:
                 st.warning("Horas debe ser mayor a 0.")
             else:
                 rid = insert_registro(
-                    alumno_id, lugar_row['id'], actividad, fecha, horas, 
+                    alumno_id, lugar_id, actividad, fecha, horas, 
                     anio, semestre, usuario=current_user()
                 )
                 st.success(f"Registro agregado con ID {rid} (pendiente de validación)")
@@ -72,61 +92,74 @@ else:
 
 st.divider()
 
-st.subheader("Listado de registros")
-show_pend = st.checkbox("Ver solo pendientes", value=False)
-# Si es estudiante, filtrar por su alumno
-if current_role() == 'Estudiante':
-    sel_al = str(current_alumno_id())
-else:
-    sel_al = st.selectbox(
-        "Filtrar por alumno (opcional)", 
-        ["Todos"] + alumnos["id"].astype(str).tolist()
-    ) if not alumnos.empty else "Todos"
-
-sel_anio = st.number_input("Año (opcional)", min_value=0, max_value=9999, value=0, step=1)
-sel_sem = st.selectbox("Semestre (opcional)", ["-", 1, 2], index=0)
-
-kwargs = {}
-if show_pend:
-    kwargs['pendientes'] = True
-if sel_al != "Todos":
-    kwargs['alumno_id'] = int(sel_al)
-if sel_anio != 0:
-    kwargs['anio'] = int(sel_anio)
-if sel_sem != "-":
-    kwargs['semestre'] = int(sel_sem)
-
-reg_df = list_registros(**kwargs)
-if reg_df.empty:
-    st.info("No hay registros con ese filtro.")
-else:
-    display_df = reg_df.drop(columns=["alumno_id", "lugar_id"], errors='ignore')
-    st.dataframe(display_df, use_container_width=True)
-
-    csv_bytes = display_df.to_csv(index=False).encode('utf-8-sig')
-    default_name = f"registros_{sel_al}_{sel_anio}_{sel_sem if sel_sem!='-' else 'all'}.csv"
-    st.download_button(
-        label=":material/download: Exportar CSV (filtro actual)",
-        data=csv_bytes,
-        file_name=default_name,
-        mime="text/csv",
-        use_container_width=True
-    )
-
-    # Exportar TODO (ignora filtros)
-    st.markdown("### :material/download: Exportar TODO")
-    try:
-        _all_df = list_registros()
-        _all_display = _all_df.drop(columns=["alumno_id","lugar_id"], errors='ignore')
-        if not _all_display.empty:
-            st.download_button(
-                label="Exportar TODO (CSV)",
-                data=_all_display.to_csv(index=False).encode('utf-8-sig'),
-                file_name="registros_TODO.csv",
-                mime="text/csv",
-                use_container_width=True
-            )
+
+# Los filtros viven dentro del fragmento: al cambiarlos sólo se re-ejecuta
+# el listado, no los catálogos ni el formulario de alta.
+@st.fragment
+def _listado(alumnos, rol, aid):
+    st.subheader("Listado de registros")
+    # Un solo submit aplica todos los filtros (un rerun/consulta en vez de uno por widget)
+    with st.form("filtros"):
+        show_pend = st.checkbox("Ver solo pendientes", value=False)
+        # Si es estudiante, filtrar por su alumno
+        if rol == 'Estudiante':
+            sel_al = str(aid)
         else:
-            st.caption("No hay datos globales para exportar.")
-    except Exception as e:
-        st.caption(f"No se pudo generar el CSV global: {e}")
\ No newline at end of file
+            sel_al = st.selectbox(
+                "Filtrar por alumno (opcional)", 
+                ["Todos"] + alumnos["id"].astype(str).tolist()
+            ) if not alumnos.empty else "Todos"
+
+        sel_anio = st.number_input("Año (opcional)", min_value=0, max_value=9999, value=0, step=1)
+        sel_sem = st.selectbox("Semestre (opcional)", ["-", 1, 2], index=0)
+        st.form_submit_button(":material/filter_alt: Aplicar filtros")
+
+    kwargs = {}
+    if show_pend:
+        kwargs['pendientes'] = True
+    if sel_al != "Todos":
+        kwargs['alumno_id'] = int(sel_al)
+    if sel_anio != 0:
+        kwargs['anio'] = int(sel_anio)
+    if sel_sem != "-":
+        kwargs['semestre'] = int(sel_sem)
+
+    reg_df = list_registros(**kwargs)
+    if reg_df.empty:
+        st.info("No hay registros con ese filtro.")
+    else:
+        display_df = reg_df.drop(columns=["alumno_id", "lugar_id"], errors='ignore')
+        st.dataframe(display_df, use_container_width=True)
+
+        csv_bytes = _csv_bytes(display_df)
+        default_name = f"registros_{sel_al}_{sel_anio}_{sel_sem if sel_sem!='-' else 'all'}.csv"
+        st.download_button(
+            label=":material/download: Exportar CSV (filtro actual)",
+            data=csv_bytes,
+            file_name=default_name,
+            mime="text/csv",
+            use_container_width=True
+        )
+
+        # Exportar TODO (ignora filtros); la consulta global sólo se hace en el rerun del
+        # clic, no en los siguientes (p. ej. al cambiar filtros)
+        st.markdown("### :material/download: Exportar TODO")
+        if st.button("Preparar export TODO", use_container_width=True):
+            try:
+                _all_df = list_registros_todos()
+                _all_display = _all_df.drop(columns=["alumno_id","lugar_id"], errors='ignore')
+                if not _all_display.empty:
+                    st.download_button(
+                        label="Exportar TODO (CSV)",
+                        data=_csv_bytes(_all_display),
+                        file_name="registros_TODO.csv",
+                        mime="text/csv",
+                        use_container_width=True
+                    )
+                else:
+                    st.caption("No hay datos globales para exportar.")
+            except Exception as e:
+                st.caption(f"No se pudo generar el CSV global: {e}")
+
+
+_listado(alumnos, rol, aid)
@@ -1,6 +1,7 @@
 # ============== pages/4_Validacion.py ==============
+import math
 import streamlit as st
-from utils.db import list_registros, validar_registro
+from utils.db import list_registros, validar_registros_bulk
 from utils.auth import require_login, render_userbox, has_role, current_user
 
 st.set_page_config(
@@ -13,16 +14,23 @@ render_userbox()
 require_login()
 
 # Restringir a Empresa/Departamento/Admin
-if not has_role({'Empresa','Departamento','Admin'}):
+if not has_role(('Empresa','Departamento','Admin')):
     st.error("No tienes permiso para esta página.")
     st.stop()
 
 st.title(":material/check_box: Validación de Registros")
 
-pend = list_registros(pendientes=True)
-if pend.empty:
+POR_PAGINA = 50
+
+# Paginación en el servidor: sólo viaja al navegador la página visible
+total = list_registros(pendientes=True, count_only=True)
+if total == 0:
     st.info("No hay registros pendientes.")
 else:
+    paginas = math.ceil(total / POR_PAGINA)
+    pagina = st.number_input("Página", min_value=1, max_value=paginas, value=1, step=1)
+    st.caption(f"{total} pendientes · página {pagina} de {paginas}")
+    pend = list_registros(pendientes=True, limit=POR_PAGINA, offset=(pagina - 1) * POR_PAGINA)
     st.dataframe(pend, use_container_width=True)
     ids = st.multiselect("Selecciona IDs a validar", pend["id"].tolist())
     validador = st.text_input("Validador (nombre)", value=current_user())
@@ -30,7 +38,6 @@ else:
         if not ids:
             st.warning("Selecciona al menos un registro.")
         else:
-            for rid in ids:
-                validar_registro(int(rid), validador)
+            validar_registros_bulk(ids, validador, usuario=current_user())
             st.success("Registros validados.")
             st.rerun()
\ No newline at end of file
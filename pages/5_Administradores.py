@@ -1,4 +1,5 @@
 import streamlit as st
+import pandas as pd
 from utils.auth import require_login, render_userbox, has_role
 import re
 
@@ -7,13 +8,20 @@ try:
     from utils.microsoft_auth import (
         get_admin_list, 
         add_admin_from_code, 
-        remove_admin_by_code,
-        is_current_user_admin
+        add_admins_from_codes,
+        remove_admin_by_code
     )
     MICROSOFT_AVAILABLE = True
 except ImportError:
     MICROSOFT_AVAILABLE = False
 
+# Patrones compilados una vez (antes se recompilaban dentro de bucles y formularios)
+_CODE_RE = re.compile(r'(2\d+)')
+_EMAIL_RE = re.compile(r'([a-zA-Z]+)(2\d+)')
+_SPLIT_RE = re.compile(r'[,\s\n]+')
+# Elimina los no-dígitos en una sola pasada (en C, sin generador por carácter)
+_NON_DIGITS_RE = re.compile(r'\D+')
+
 st.set_page_config(
     page_title="Administradores",
     page_icon=":material/admin_panel_settings:",
@@ -24,7 +32,7 @@ render_userbox()
 require_login()
 
 # Restringir solo a Admin
-if not has_role({'Admin'}):
+if not has_role(('Admin',)):
     st.error(":material/block: Solo administradores pueden acceder a esta página")
     st.stop()
 
@@ -54,39 +62,31 @@ admin_codes = get_admin_list()
 if admin_codes:
     st.info(f"📊 Total de administradores: **{len(admin_codes)}**")
     
-    # Mostrar en tabla
-    col1, col2, col3 = st.columns([2, 2, 1])
-    with col1:
-        st.markdown("**Código de Estudiante**")
-    with col2:
-        st.markdown("**Email (aproximado)**")
-    with col3:
-        st.markdown("**Acción**")
+    # Código del admin actual (no puede removerse a sí mismo)
+    current_email = st.session_state.get("email", "")
+    current_code = m.group(1) if (m := _CODE_RE.search(current_email)) else None
     
-    st.markdown("---")
+    # Una sola tabla en vez de columnas + widgets por admin
+    admin_df = pd.DataFrame({
+        "Código de Estudiante": admin_codes,
+        # Aproximar el formato de email
+        "Email (aproximado)": [f"xxx{code}@uvg.edu.gt" for code in admin_codes],
+        "": ["(Tú)" if code == current_code else "" for code in admin_codes],
+    })
+    st.dataframe(admin_df, use_container_width=True, hide_index=True)
     
-    for code in admin_codes:
-        col1, col2, col3 = st.columns([2, 2, 1])
+    removibles = [code for code in admin_codes if code != current_code]
+    if removibles:
+        col1, col2 = st.columns([3, 1], vertical_alignment="bottom")
         with col1:
-            st.text(code)
+            to_remove = st.selectbox(":material/person_remove: Remover administrador", removibles)
         with col2:
-            # Aproximar el formato de email
-            st.text(f"xxx{code}@uvg.edu.gt")
-        with col3:
-            # No permitir que el admin actual se remueva a sí mismo
-            current_email = st.session_state.get("email", "")
-            current_code_match = re.search(r'(2\d+)', current_email)
-            current_code = current_code_match.group(1) if current_code_match else None
-            
-            if code == current_code:
-                st.caption("(Tú)")
-            else:
-                if st.button(":material/delete:", key=f"remove_{code}", help="Remover administrador"):
-                    if remove_admin_by_code(code):
-                        st.success(f"✅ Administrador {code} removido")
-                        st.rerun()
-                    else:
-                        st.error("❌ Error al remover")
+            if st.button(":material/delete: Remover seleccionado", use_container_width=True):
+                if remove_admin_by_code(to_remove):
+                    st.success(f"✅ Administrador {to_remove} removido")
+                    st.rerun()
+                else:
+                    st.error("❌ Error al remover")
 else:
     st.warning("⚠️ No hay administradores configurados")
 
@@ -115,7 +115,7 @@ with tab1:
                 st.warning("⚠️ Ingresa un código de estudiante")
             else:
                 # Normalizar código
-                digits = ''.join(ch for ch in codigo_input if ch.isdigit())
+                digits = _NON_DIGITS_RE.sub('', codigo_input)
                 if not digits:
                     st.error("❌ Código inválido. Solo ingresa números")
                 else:
@@ -153,9 +153,9 @@ with tab2:
                 if not email_lower.endswith("@uvg.edu.gt"):
                     st.error("❌ El email debe terminar en @uvg.edu.gt")
                 else:
-                    local = email_lower.split("@")[0]
+                    local = email_lower.partition("@")[0]
                     # Buscar patrón: letras + 2 + dígitos
-                    m = re.fullmatch(r'([a-zA-Z]+)(2\d+)', local)
+                    m = _EMAIL_RE.fullmatch(local)
                     
                     if not m:
                         st.error("❌ Email inválido. Debe tener el formato: letras + código (ej: jua25837@uvg.edu.gt)")
@@ -190,31 +190,20 @@ with st.expander(":material/group_add: Agregar Múltiples Administradores"):
                 st.warning("⚠️ Ingresa al menos un código")
             else:
                 # Separar por comas, saltos de línea y espacios
-                import re
-                codigos = re.split(r'[,\s\n]+', codigos_multiples.strip())
+                codigos = _SPLIT_RE.split(codigos_multiples.strip())
                 
-                added_count = 0
-                already_admin = 0
+                # Normalizar todo primero y agregar el conjunto en una sola llamada
+                codes = set()
                 errors = []
-                
-                for codigo in codigos:
-                    codigo = codigo.strip()
-                    if not codigo:
-                        continue
-                    
-                    # Normalizar
-                    digits = ''.join(ch for ch in codigo if ch.isdigit())
+                for codigo in filter(None, codigos):
+                    digits = _NON_DIGITS_RE.sub('', codigo)
                     if not digits:
                         errors.append(f"Inválido: {codigo}")
-                        continue
-                    
-                    if not digits.startswith('2'):
-                        digits = '2' + digits
-                    
-                    if add_admin_from_code(digits):
-                        added_count += 1
                     else:
-                        already_admin += 1
+                        codes.add(digits if digits.startswith('2') else '2' + digits)
+                
+                added_count = add_admins_from_codes(codes) if codes else 0
+                already_admin = len(codes) - added_count
                 
                 # Mostrar resultados
                 if added_count > 0:
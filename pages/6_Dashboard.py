@@ -1,5 +1,6 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
@@ -18,15 +19,14 @@ require_login()
 st.title(":material/dashboard: Dashboard de Horas de Extensión")
 
 # Verificar permisos (Admin, Departamento)
-if not has_role({'Admin', 'Departamento', 'Docente'}):
+if not has_role(('Admin', 'Departamento', 'Docente')):
     st.warning("⚠️ Esta página es solo para Administradores y Departamento")
     st.stop()
 
-# Obtener conexión a la BD
-con = get_con()
-
-# Cargar datos
-@st.cache_data(ttl=60)
+# Cargar datos (detalle de registros; se usa para exportar el filtro actual).
+# cache_resource devuelve siempre el mismo DataFrame sin pickle/unpickle por rerun:
+# NO mutarlo en sitio (ni columnas ni dtypes); filtrar siempre a un frame nuevo.
+@st.cache_resource(ttl=60, show_spinner=False)
 def load_data():
     """Carga datos de registros con información de alumnos y lugares"""
     query = """
@@ -45,20 +45,508 @@ def load_data():
     JOIN alumnos a ON a.id = r.alumno_id
     JOIN lugares l ON l.id = r.lugar_id
     WHERE a.activo = TRUE AND l.activo = TRUE
-    ORDER BY r.fecha DESC
     """
-    df = con.execute(query).df()
+    df = get_con().execute(query).df()
     if not df.empty:
-        df['fecha'] = pd.to_datetime(df['fecha'])
-        df['mes'] = df['fecha'].dt.to_period('M').astype(str)
-        df['mes_num'] = df['fecha'].dt.month
-        df['anio_completo'] = df['fecha'].dt.year
+        # DuckDB ya entrega DATE como datetime64: sólo parsear si no lo es
+        if not pd.api.types.is_datetime64_any_dtype(df['fecha']):
+            df['fecha'] = pd.to_datetime(df['fecha'], format='%Y-%m-%d', cache=True)
+        df['mes'] = df['fecha'].dt.strftime('%Y-%m')
+        # Tipos compactos: categorías (códigos enteros) y enteros chicos. horas queda en
+        # float64: en float32 el CSV exportado mostraría 2.2999999523 en vez de 2.3
+        for c in ('alumno', 'lugar', 'semestre', 'mes'):
+            df[c] = df[c].astype('category')
+        df['anio'] = df['anio'].astype('int16')
+        df['validado'] = df['validado'].astype('bool')
     return df
 
-try:
+
+# Agregaciones calculadas dentro de DuckDB: a Python sólo llegan filas ya agrupadas
+_FROM_REGISTROS = """
+    FROM registros r
+    JOIN alumnos a ON a.id = r.alumno_id
+    JOIN lugares l ON l.id = r.lugar_id
+"""
+
+
+def _where(anios=(), semestres=(), estado="Todos"):
+    """WHERE común: alumnos/lugares activos + filtros del panel."""
+    where = ["a.activo = TRUE", "l.activo = TRUE"]
+    params = []
+    if anios:
+        where.append("r.anio IN (SELECT unnest(?))")
+        params.append(list(anios))
+    if semestres:
+        where.append("r.semestre IN (SELECT unnest(?))")
+        params.append(list(semestres))
+    if estado == "Validados":
+        where.append("r.validado = TRUE")
+    elif estado == "Pendientes":
+        where.append("r.validado = FALSE")
+    return " WHERE " + " AND ".join(where), params
+
+
+def _agg(select_sql: str, filtros: tuple, group_sql: str = "") -> pd.DataFrame:
+    where_sql, params = _where(*filtros)
+    return get_con().execute(f"SELECT {select_sql} {_FROM_REGISTROS} {where_sql} {group_sql}", params).df()
+
+
+@st.cache_data(ttl=60)
+def opciones_filtro():
+    """Años y semestres disponibles para los filtros."""
+    where_sql, params = _where()
+    cur = get_con()
+    anios = [r[0] for r in cur.execute(f"SELECT DISTINCT r.anio {_FROM_REGISTROS} {where_sql} ORDER BY 1", params).fetchall()]
+    semestres = [r[0] for r in cur.execute(f"SELECT DISTINCT r.semestre {_FROM_REGISTROS} {where_sql} ORDER BY 1", params).fetchall()]
+    return anios, semestres
+
+
+@st.cache_data(ttl=60)
+def agg_totals(filtros: tuple = ()) -> dict:
+    """Totales generales (horas, registros, validadas, pendientes, promedio) en una sola pasada."""
+    where_sql, params = _where(*filtros)
+    cur = get_con().execute(
+        f"""
+        SELECT
+            COALESCE(SUM(r.horas), 0)::DOUBLE AS total_horas,
+            COUNT(*) AS total_registros,
+            COALESCE(SUM(CASE WHEN r.validado THEN r.horas ELSE 0 END), 0)::DOUBLE AS horas_validadas,
+            COUNT(*) FILTER (WHERE NOT r.validado) AS pendientes,
+            AVG(r.horas)::DOUBLE AS promedio_horas
+        {_FROM_REGISTROS} {where_sql}
+        """,
+        params
+    )
+    # Una sola fila: tupla nativa, sin construir un DataFrame
+    return dict(zip((d[0] for d in cur.description), cur.fetchone()))
+
+
+@st.cache_data(ttl=60)
+def agg_by_alumno(filtros: tuple) -> pd.DataFrame:
+    """Una sola agrupación por alumno para las pestañas Por Estudiante y Validaciones."""
+    return _agg(
+        """
+        a.nombre AS alumno,
+        SUM(r.horas)::DOUBLE AS horas,
+        AVG(r.validado::DOUBLE) * 100 AS pct_validado
+        """,
+        filtros, "GROUP BY a.nombre ORDER BY horas DESC"
+    )
+
+
+@st.cache_data(ttl=60)
+def agg_by_lugar(filtros: tuple) -> pd.DataFrame:
+    return _agg(
+        """
+        l.nombre AS lugar,
+        SUM(r.horas)::DOUBLE AS total,
+        AVG(r.horas)::DOUBLE AS promedio,
+        COUNT(*) AS registros
+        """,
+        filtros, "GROUP BY l.nombre"
+    )
+
+
+@st.cache_data(ttl=60)
+def agg_by_mes(filtros: tuple) -> pd.DataFrame:
+    return _agg(
+        "strftime(r.fecha, '%Y-%m') AS mes, COUNT(*) AS registros, SUM(r.horas)::DOUBLE AS horas",
+        filtros, "GROUP BY mes ORDER BY mes"
+    )
+
+
+@st.cache_data(ttl=60)
+def agg_by_validado(filtros: tuple) -> pd.DataFrame:
+    return _agg(
+        "r.validado, COUNT(*) AS registros, SUM(r.horas)::DOUBLE AS horas",
+        filtros, "GROUP BY r.validado"
+    )
+
+
+@st.cache_data(ttl=60)
+def agg_by_semestre(filtros: tuple) -> pd.DataFrame:
+    return _agg(
+        "r.semestre, SUM(r.horas)::DOUBLE AS horas",
+        filtros, "GROUP BY r.semestre ORDER BY r.semestre"
+    )
+
+
+@st.cache_data(ttl=60)
+def distribucion_horas(filtros: tuple, bins: int = 20) -> dict:
+    """
+    Histograma y resumen de cinco números calculados en el servidor:
+    al navegador llegan O(bins) valores en vez de todas las horas.
+    """
+    horas = _agg("r.horas::DOUBLE AS horas", filtros)['horas'].to_numpy()
+    if horas.size == 0:
+        return {'n': 0}
+    counts, edges = np.histogram(horas, bins=bins)
+    q1, mediana, q3 = np.percentile(horas, [25, 50, 75])
+    # Bigotes de Tukey (1.5 IQR) acotados a los datos; lo de afuera son outliers
+    iqr = q3 - q1
+    dentro = (horas >= q1 - 1.5 * iqr) & (horas <= q3 + 1.5 * iqr)
+    return {
+        'n': int(horas.size),
+        'centros': (edges[:-1] + edges[1:]) / 2,
+        'anchos': np.diff(edges),
+        'counts': counts,
+        'q1': q1,
+        'mediana': mediana,
+        'q3': q3,
+        'lowerfence': horas[dentro].min(),
+        'upperfence': horas[dentro].max(),
+        'outliers': horas[~dentro],
+        'media': horas.mean(),
+        'min': horas.min(),
+        'max': horas.max(),
+        'std': horas.std(ddof=1) if horas.size > 1 else float('nan'),
+    }
+
+
+# CSVs de exportación: se serializan una vez por combinación de filtros, no en cada rerun
+@st.cache_data(ttl=60, show_spinner=False)
+def csv_filtrado(filtros: tuple) -> bytes:
+    """Detalle filtrado (una sola máscara y un solo gather en vez de un frame por filtro)."""
+    anio_filtro, semestre_filtro, validado_filtro = filtros
     df = load_data()
+    mask = np.ones(len(df), dtype=bool)
+    if anio_filtro:
+        mask &= df['anio'].isin(anio_filtro).to_numpy()
+    if semestre_filtro:
+        mask &= df['semestre'].isin(semestre_filtro).to_numpy()
+    if validado_filtro == "Validados":
+        mask &= df['validado'].to_numpy()
+    elif validado_filtro == "Pendientes":
+        mask &= ~df['validado'].to_numpy()
+    # Más recientes primero, como siempre se exportó; sólo se ordena el subconjunto filtrado
+    return df.loc[mask].sort_values('fecha', ascending=False).to_csv(index=False).encode('utf-8-sig')
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def csv_resumen(filtros: tuple) -> bytes:
+    totales_filtro = agg_totals(filtros)
+    resumen = {
+        'Total Horas': totales_filtro['total_horas'],
+        'Total Registros': int(totales_filtro['total_registros']),
+        'Promedio Horas': totales_filtro['promedio_horas'],
+        'Horas Validadas': totales_filtro['horas_validadas'],
+        'Pendientes': int(totales_filtro['pendientes'])
+    }
+    return pd.DataFrame([resumen]).to_csv(index=False).encode('utf-8-sig')
+
+
+# Cada pestaña es un fragmento: lo que ocurra dentro de una pestaña sólo
+# re-ejecuta esa pestaña; todas leen agregaciones cacheadas por filtros.
+
+# --- TAB 1: Por Estudiante ---
+@st.fragment
+def _tab_por_estudiante(filtros):
+    st.markdown("### :material/school: Total de Horas por Estudiante")
+
+    horas_por_alumno = agg_by_alumno(filtros)[['alumno', 'horas']]
+
+    if not horas_por_alumno.empty:
+        fig = px.bar(
+            x=horas_por_alumno['horas'],
+            y=horas_por_alumno['alumno'],
+            orientation='h',
+            labels={'x': 'Horas Totales', 'y': 'Estudiante'},
+            title='Horas Acumuladas por Estudiante',
+            color=horas_por_alumno['horas'],
+            color_continuous_scale='Blues'
+        )
+        fig.update_layout(
+            height=max(400, len(horas_por_alumno) * 30),
+            showlegend=False,
+            xaxis_title="Horas",
+            yaxis_title="Estudiante"
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+        # Top 5
+        st.markdown("#### :material/star: Top 5 Estudiantes")
+        top5 = horas_por_alumno.head(5).copy()
+        top5.columns = ['Estudiante', 'Horas']
+        top5.index = top5.index + 1
+        st.dataframe(top5, use_container_width=True)
+    else:
+        st.info("No hay datos para mostrar con los filtros seleccionados")
+
+
+# --- TAB 2: Por Lugar ---
+TOP_LUGARES_PIE = 15
+
+@st.fragment
+def _tab_por_lugar(filtros):
+    st.markdown("### :material/location_on: Análisis por Lugar")
+
+    por_lugar = agg_by_lugar(filtros)
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.markdown("#### Promedio de Horas por Lugar")
+        prom_lugar = por_lugar.sort_values('promedio', ascending=False)
+
+        if not prom_lugar.empty:
+            fig = px.bar(
+                x=prom_lugar['promedio'],
+                y=prom_lugar['lugar'],
+                orientation='h',
+                labels={'x': 'Promedio de Horas', 'y': 'Lugar'},
+                color=prom_lugar['promedio'],
+                color_continuous_scale='Greens'
+            )
+            fig.update_layout(
+                height=max(300, len(prom_lugar) * 25),
+                showlegend=False
+            )
+            st.plotly_chart(fig, use_container_width=True)
+
+    with col2:
+        st.markdown("#### Total de Horas por Lugar")
+        total_lugar = por_lugar.sort_values('total', ascending=False)
+
+        if not total_lugar.empty:
+            # Top-K lugares; la cola larga se agrupa en "Otros"
+            pie_valores = total_lugar['total'].tolist()[:TOP_LUGARES_PIE]
+            pie_nombres = total_lugar['lugar'].tolist()[:TOP_LUGARES_PIE]
+            if len(total_lugar) > TOP_LUGARES_PIE:
+                pie_valores.append(total_lugar['total'].iloc[TOP_LUGARES_PIE:].sum())
+                pie_nombres.append("Otros")
+            fig = px.pie(
+                values=pie_valores,
+                names=pie_nombres,
+                title='Distribución de Horas Totales'
+            )
+            fig.update_traces(textposition='inside', textinfo='percent+label')
+            st.plotly_chart(fig, use_container_width=True)
+
+    # Tabla de lugares
+    st.markdown("#### :material/table: Resumen por Lugar")
+    resumen_lugar = total_lugar.set_index('lugar').round(2)
+    resumen_lugar.columns = ['Total Horas', 'Promedio', 'Cantidad Registros']
+    st.dataframe(resumen_lugar, use_container_width=True)
+
+
+# --- TAB 3: Por Mes ---
+@st.fragment
+def _tab_por_mes(filtros):
+    st.markdown("### :material/calendar_today: Registros por Mes")
+
+    registros_mes = agg_by_mes(filtros)
+    registros_mes.columns = ['Mes', 'Cantidad Registros', 'Total Horas']
+
+    if not registros_mes.empty:
+        col1, col2 = st.columns(2)
+
+        with col1:
+            fig = px.line(
+                registros_mes,
+                x='Mes',
+                y='Cantidad Registros',
+                markers=True,
+                title='Cantidad de Registros por Mes'
+            )
+            fig.update_traces(line_color='#FF6B6B', line_width=3)
+            fig.update_layout(hovermode='x unified')
+            st.plotly_chart(fig, use_container_width=True)
+
+        with col2:
+            fig = px.bar(
+                registros_mes,
+                x='Mes',
+                y='Total Horas',
+                title='Horas Totales por Mes',
+                color='Total Horas',
+                color_continuous_scale='Oranges'
+            )
+            st.plotly_chart(fig, use_container_width=True)
+
+        # Tendencia
+        st.markdown("#### :material/trending_up: Tendencia")
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(
+            x=registros_mes['Mes'],
+            y=registros_mes['Cantidad Registros'],
+            name='Registros',
+            mode='lines+markers',
+            line=dict(color='#4ECDC4', width=3)
+        ))
+        fig.add_trace(go.Scatter(
+            x=registros_mes['Mes'],
+            y=registros_mes['Total Horas'],
+            name='Horas',
+            mode='lines+markers',
+            line=dict(color='#FF6B6B', width=3),
+            yaxis='y2'
+        ))
+        fig.update_layout(
+            title='Evolución de Registros y Horas',
+            yaxis=dict(title='Cantidad Registros'),
+            yaxis2=dict(title='Total Horas', overlaying='y', side='right'),
+            hovermode='x unified',
+            height=400
+        )
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.info("No hay datos para mostrar")
+
+
+# --- TAB 4: Validaciones ---
+TOP_ALUMNOS_SCATTER = 50
+
+@st.fragment
+def _tab_validaciones(filtros):
+    st.markdown("### :material/fact_check: Estado de Validaciones")
+
+    por_validado = agg_by_validado(filtros)
+    col1, col2 = st.columns(2)
+
+    with col1:
+        # Pie chart de validaciones
+        conteo_val = por_validado.sort_values('registros', ascending=False)
+        labels = ['Validados' if k else 'Pendientes' for k in conteo_val['validado']]
+
+        fig = px.pie(
+            values=conteo_val['registros'],
+            names=labels,
+            title='Proporción de Validaciones',
+            color_discrete_sequence=['#2ECC71', '#E74C3C']
+        )
+        fig.update_traces(textposition='inside', textinfo='percent+label+value')
+        st.plotly_chart(fig, use_container_width=True)
+
+    with col2:
+        # Horas validadas vs pendientes
+        horas_val = por_validado.sort_values('validado')
+        labels_horas = ['Validadas' if k else 'Pendientes' for k in horas_val['validado']]
+
+        fig = go.Figure(data=[
+            go.Bar(
+                x=labels_horas,
+                y=horas_val['horas'],
+                marker_color=['#2ECC71', '#E74C3C'],
+                text=horas_val['horas'].round(1),
+                textposition='auto'
+            )
+        ])
+        fig.update_layout(
+            title='Horas: Validadas vs Pendientes',
+            yaxis_title='Horas',
+            showlegend=False
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+    # Tasa de validación por estudiante
+    st.markdown("#### :material/person_check: Tasa de Validación por Estudiante")
+    val_por_alumno = agg_by_alumno(filtros).set_index('alumno')[['pct_validado', 'horas']].round(2)
+    val_por_alumno.columns = ['% Validado', 'Total Horas']
+    val_por_alumno = val_por_alumno.sort_values('% Validado', ascending=False)
+    # Sólo los alumnos con más horas (un punto por alumno en el navegador)
+    if len(val_por_alumno) > TOP_ALUMNOS_SCATTER:
+        val_por_alumno = val_por_alumno.nlargest(TOP_ALUMNOS_SCATTER, 'Total Horas')
+        st.caption(f"Mostrando los {TOP_ALUMNOS_SCATTER} estudiantes con más horas.")
+
+    fig = px.scatter(
+        val_por_alumno.reset_index(),
+        x='Total Horas',
+        y='% Validado',
+        hover_data=['alumno'],
+        size='Total Horas',
+        color='% Validado',
+        color_continuous_scale='RdYlGn',
+        title='Relación entre Horas Totales y Tasa de Validación'
+    )
+    fig.update_layout(height=500)
+    st.plotly_chart(fig, use_container_width=True)
+
+
+# --- TAB 5: Distribución ---
+@st.fragment
+def _tab_distribucion(filtros):
+    st.markdown("### :material/align_horizontal_left: Distribución de Horas")
+
+    dist = distribucion_horas(filtros)
+    # Sin filas no hay figuras ni estadísticas que calcular
+    if dist['n'] == 0:
+        st.caption("No hay registros para graficar la distribución.")
+        return
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        # Histograma (bins precalculados)
+        fig = px.bar(
+            x=dist['centros'],
+            y=dist['counts'],
+            title='Distribución de Horas por Registro',
+            labels={'x': 'Horas', 'y': 'Frecuencia'},
+            color_discrete_sequence=['#9B59B6']
+        )
+        fig.update_traces(width=dist['anchos'])
+        fig.update_layout(showlegend=False, bargap=0)
+        st.plotly_chart(fig, use_container_width=True)
+
+    with col2:
+        # Box plot (cuartiles y bigotes precalculados + outliers)
+        fig = go.Figure(go.Box(
+            name='horas',
+            q1=[dist['q1']],
+            median=[dist['mediana']],
+            q3=[dist['q3']],
+            lowerfence=[dist['lowerfence']],
+            upperfence=[dist['upperfence']],
+            mean=[dist['media']],
+            marker_color='#3498DB'
+        ))
+        if dist['outliers'].size:
+            fig.add_trace(go.Scatter(
+                x=['horas'] * dist['outliers'].size,
+                y=dist['outliers'],
+                mode='markers',
+                marker_color='#3498DB'
+            ))
+        fig.update_layout(title='Distribución de Horas (Box Plot)', showlegend=False, yaxis_title='Horas')
+        st.plotly_chart(fig, use_container_width=True)
+
+    # Estadísticas descriptivas
+    st.markdown("#### :material/calculate: Estadísticas Descriptivas")
+    col1, col2, col3, col4, col5 = st.columns(5)
+
+    with col1:
+        st.metric("Media", f"{dist['media']:.2f}")
+    with col2:
+        st.metric("Mediana", f"{dist['mediana']:.2f}")
+    with col3:
+        st.metric("Mínimo", f"{dist['min']:.2f}")
+    with col4:
+        st.metric("Máximo", f"{dist['max']:.2f}")
+    with col5:
+        st.metric("Desv. Est.", f"{dist['std']:.2f}")
+
+    # Distribución por semestre
+    st.markdown("#### :material/school: Horas por Semestre")
+    horas_semestre = agg_by_semestre(filtros)
+
+    fig = px.bar(
+        horas_semestre,
+        x='semestre',
+        y='horas',
+        title='Total de Horas por Semestre',
+        labels={'semestre': 'Semestre', 'horas': 'Total Horas'},
+        color='horas',
+        color_continuous_scale='Viridis'
+    )
+    fig.update_xaxes(type='category')
+    st.plotly_chart(fig, use_container_width=True)
+
+
+try:
+    # Los totales generales se necesitan igual para las métricas: su COUNT(*)
+    # sirve de verificación de "sin datos" sin cargar ni ordenar el detalle
+    totales = agg_totals()
     
-    if df.empty:
+    if totales['total_registros'] == 0:
         st.info("📊 No hay datos para mostrar. Agrega registros primero.")
         st.stop()
     
@@ -68,7 +556,7 @@ try:
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        total_horas = df['horas'].sum()
+        total_horas = totales['total_horas']
         st.metric(
             ":material/schedule: Total de Horas",
             f"{total_horas:,.1f}",
@@ -76,7 +564,7 @@ try:
         )
     
     with col2:
-        total_registros = len(df)
+        total_registros = int(totales['total_registros'])
         st.metric(
             ":material/assignment: Total Registros",
             f"{total_registros:,}",
@@ -84,7 +572,7 @@ try:
         )
     
     with col3:
-        horas_validadas = df[df['validado'] == True]['horas'].sum()
+        horas_validadas = totales['horas_validadas']
         st.metric(
             ":material/verified: Horas Validadas",
             f"{horas_validadas:,.1f}",
@@ -92,7 +580,7 @@ try:
         )
     
     with col4:
-        pendientes = len(df[df['validado'] == False])
+        pendientes = int(totales['pendientes'])
         st.metric(
             ":material/pending: Pendientes",
             f"{pendientes:,}",
@@ -106,9 +594,9 @@ try:
     # Filtros
     with st.expander(":material/filter_alt: Filtros", expanded=False):
         col1, col2, col3 = st.columns(3)
+        anios_disponibles, semestres_disponibles = opciones_filtro()
         
         with col1:
-            anios_disponibles = sorted(df['anio'].unique())
             anio_filtro = st.multiselect(
                 "Año",
                 options=anios_disponibles,
@@ -117,7 +605,6 @@ try:
             )
         
         with col2:
-            semestres_disponibles = sorted(df['semestre'].unique())
             semestre_filtro = st.multiselect(
                 "Semestre",
                 options=semestres_disponibles,
@@ -129,17 +616,14 @@ try:
                 "Estado",
                 options=["Todos", "Validados", "Pendientes"]
             )
-        
-        # Aplicar filtros
-        df_filtrado = df.copy()
-        if anio_filtro:
-            df_filtrado = df_filtrado[df_filtrado['anio'].isin(anio_filtro)]
-        if semestre_filtro:
-            df_filtrado = df_filtrado[df_filtrado['semestre'].isin(semestre_filtro)]
-        if validado_filtro == "Validados":
-            df_filtrado = df_filtrado[df_filtrado['validado'] == True]
-        elif validado_filtro == "Pendientes":
-            df_filtrado = df_filtrado[df_filtrado['validado'] == False]
+    
+    # Clave de filtros (hashable) compartida por todas las agregaciones cacheadas
+    filtros = (tuple(anio_filtro), tuple(semestre_filtro), validado_filtro)
+    
+    # Sin filas para el filtro: no construir ninguna figura
+    if agg_totals(filtros)['total_registros'] == 0:
+        st.info("No hay datos para mostrar con los filtros seleccionados")
+        st.stop()
     
     # Visualizaciones en tabs
     tab1, tab2, tab3, tab4, tab5 = st.tabs([
@@ -150,274 +634,16 @@ try:
         ":material/bar_chart: Distribución"
     ])
     
-    # --- TAB 1: Por Estudiante ---
     with tab1:
-        st.markdown("### :material/school: Total de Horas por Estudiante")
-        
-        horas_por_alumno = df_filtrado.groupby('alumno')['horas'].sum().sort_values(ascending=False)
-        
-        if not horas_por_alumno.empty:
-            fig = px.bar(
-                x=horas_por_alumno.values,
-                y=horas_por_alumno.index,
-                orientation='h',
-                labels={'x': 'Horas Totales', 'y': 'Estudiante'},
-                title='Horas Acumuladas por Estudiante',
-                color=horas_por_alumno.values,
-                color_continuous_scale='Blues'
-            )
-            fig.update_layout(
-                height=max(400, len(horas_por_alumno) * 30),
-                showlegend=False,
-                xaxis_title="Horas",
-                yaxis_title="Estudiante"
-            )
-            st.plotly_chart(fig, use_container_width=True)
-            
-            # Top 5
-            st.markdown("#### :material/star: Top 5 Estudiantes")
-            top5 = horas_por_alumno.head(5).reset_index()
-            top5.columns = ['Estudiante', 'Horas']
-            top5.index = top5.index + 1
-            st.dataframe(top5, use_container_width=True)
-        else:
-            st.info("No hay datos para mostrar con los filtros seleccionados")
-    
-    # --- TAB 2: Por Lugar ---
+        _tab_por_estudiante(filtros)
     with tab2:
-        st.markdown("### :material/location_on: Análisis por Lugar")
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.markdown("#### Promedio de Horas por Lugar")
-            prom_lugar = df_filtrado.groupby('lugar')['horas'].mean().sort_values(ascending=False)
-            
-            if not prom_lugar.empty:
-                fig = px.bar(
-                    x=prom_lugar.values,
-                    y=prom_lugar.index,
-                    orientation='h',
-                    labels={'x': 'Promedio de Horas', 'y': 'Lugar'},
-                    color=prom_lugar.values,
-                    color_continuous_scale='Greens'
-                )
-                fig.update_layout(
-                    height=max(300, len(prom_lugar) * 25),
-                    showlegend=False
-                )
-                st.plotly_chart(fig, use_container_width=True)
-        
-        with col2:
-            st.markdown("#### Total de Horas por Lugar")
-            total_lugar = df_filtrado.groupby('lugar')['horas'].sum().sort_values(ascending=False)
-            
-            if not total_lugar.empty:
-                fig = px.pie(
-                    values=total_lugar.values,
-                    names=total_lugar.index,
-                    title='Distribución de Horas Totales'
-                )
-                fig.update_traces(textposition='inside', textinfo='percent+label')
-                st.plotly_chart(fig, use_container_width=True)
-        
-        # Tabla de lugares
-        st.markdown("#### :material/table: Resumen por Lugar")
-        resumen_lugar = df_filtrado.groupby('lugar').agg({
-            'horas': ['sum', 'mean', 'count']
-        }).round(2)
-        resumen_lugar.columns = ['Total Horas', 'Promedio', 'Cantidad Registros']
-        resumen_lugar = resumen_lugar.sort_values('Total Horas', ascending=False)
-        st.dataframe(resumen_lugar, use_container_width=True)
-    
-    # --- TAB 3: Por Mes ---
+        _tab_por_lugar(filtros)
     with tab3:
-        st.markdown("### :material/calendar_today: Registros por Mes")
-        
-        registros_mes = df_filtrado.groupby('mes').agg({
-            'id': 'count',
-            'horas': 'sum'
-        }).reset_index()
-        registros_mes.columns = ['Mes', 'Cantidad Registros', 'Total Horas']
-        
-        if not registros_mes.empty:
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                fig = px.line(
-                    registros_mes,
-                    x='Mes',
-                    y='Cantidad Registros',
-                    markers=True,
-                    title='Cantidad de Registros por Mes'
-                )
-                fig.update_traces(line_color='#FF6B6B', line_width=3)
-                fig.update_layout(hovermode='x unified')
-                st.plotly_chart(fig, use_container_width=True)
-            
-            with col2:
-                fig = px.bar(
-                    registros_mes,
-                    x='Mes',
-                    y='Total Horas',
-                    title='Horas Totales por Mes',
-                    color='Total Horas',
-                    color_continuous_scale='Oranges'
-                )
-                st.plotly_chart(fig, use_container_width=True)
-            
-            # Tendencia
-            st.markdown("#### :material/trending_up: Tendencia")
-            fig = go.Figure()
-            fig.add_trace(go.Scatter(
-                x=registros_mes['Mes'],
-                y=registros_mes['Cantidad Registros'],
-                name='Registros',
-                mode='lines+markers',
-                line=dict(color='#4ECDC4', width=3)
-            ))
-            fig.add_trace(go.Scatter(
-                x=registros_mes['Mes'],
-                y=registros_mes['Total Horas'],
-                name='Horas',
-                mode='lines+markers',
-                line=dict(color='#FF6B6B', width=3),
-                yaxis='y2'
-            ))
-            fig.update_layout(
-                title='Evolución de Registros y Horas',
-                yaxis=dict(title='Cantidad Registros'),
-                yaxis2=dict(title='Total Horas', overlaying='y', side='right'),
-                hovermode='x unified',
-                height=400
-            )
-            st.plotly_chart(fig, use_container_width=True)
-        else:
-            st.info("No hay datos para mostrar")
-    
-    # --- TAB 4: Validaciones ---
+        _tab_por_mes(filtros)
     with tab4:
-        st.markdown("### :material/fact_check: Estado de Validaciones")
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            # Pie chart de validaciones
-            conteo_val = df_filtrado['validado'].value_counts()
-            labels = ['Validados' if k else 'Pendientes' for k in conteo_val.index]
-            
-            fig = px.pie(
-                values=conteo_val.values,
-                names=labels,
-                title='Proporción de Validaciones',
-                color_discrete_sequence=['#2ECC71', '#E74C3C']
-            )
-            fig.update_traces(textposition='inside', textinfo='percent+label+value')
-            st.plotly_chart(fig, use_container_width=True)
-        
-        with col2:
-            # Horas validadas vs pendientes
-            horas_val = df_filtrado.groupby('validado')['horas'].sum()
-            labels_horas = ['Validadas' if k else 'Pendientes' for k in horas_val.index]
-            
-            fig = go.Figure(data=[
-                go.Bar(
-                    x=labels_horas,
-                    y=horas_val.values,
-                    marker_color=['#2ECC71', '#E74C3C'],
-                    text=horas_val.values.round(1),
-                    textposition='auto'
-                )
-            ])
-            fig.update_layout(
-                title='Horas: Validadas vs Pendientes',
-                yaxis_title='Horas',
-                showlegend=False
-            )
-            st.plotly_chart(fig, use_container_width=True)
-        
-        # Tasa de validación por estudiante
-        st.markdown("#### :material/person_check: Tasa de Validación por Estudiante")
-        val_por_alumno = df_filtrado.groupby('alumno').agg({
-            'validado': lambda x: (x.sum() / len(x) * 100),
-            'horas': 'sum'
-        }).round(2)
-        val_por_alumno.columns = ['% Validado', 'Total Horas']
-        val_por_alumno = val_por_alumno.sort_values('% Validado', ascending=False)
-        
-        fig = px.scatter(
-            val_por_alumno.reset_index(),
-            x='Total Horas',
-            y='% Validado',
-            hover_data=['alumno'],
-            size='Total Horas',
-            color='% Validado',
-            color_continuous_scale='RdYlGn',
-            title='Relación entre Horas Totales y Tasa de Validación'
-        )
-        fig.update_layout(height=500)
-        st.plotly_chart(fig, use_container_width=True)
-    
-    # --- TAB 5: Distribución ---
+        _tab_validaciones(filtros)
     with tab5:
-        st.markdown("### :material/align_horizontal_left: Distribución de Horas")
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            # Histograma
-            fig = px.histogram(
-                df_filtrado,
-                x='horas',
-                nbins=20,
-                title='Distribución de Horas por Registro',
-                labels={'horas': 'Horas', 'count': 'Frecuencia'},
-                color_discrete_sequence=['#9B59B6']
-            )
-            fig.update_layout(showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
-        
-        with col2:
-            # Box plot
-            fig = px.box(
-                df_filtrado,
-                y='horas',
-                title='Distribución de Horas (Box Plot)',
-                color_discrete_sequence=['#3498DB']
-            )
-            fig.update_layout(showlegend=False, yaxis_title='Horas')
-            st.plotly_chart(fig, use_container_width=True)
-        
-        # Estadísticas descriptivas
-        st.markdown("#### :material/calculate: Estadísticas Descriptivas")
-        col1, col2, col3, col4, col5 = st.columns(5)
-        
-        with col1:
-            st.metric("Media", f"{df_filtrado['horas'].mean():.2f}")
-        with col2:
-            st.metric("Mediana", f"{df_filtrado['horas'].median():.2f}")
-        with col3:
-            st.metric("Mínimo", f"{df_filtrado['horas'].min():.2f}")
-        with col4:
-            st.metric("Máximo", f"{df_filtrado['horas'].max():.2f}")
-        with col5:
-            st.metric("Desv. Est.", f"{df_filtrado['horas'].std():.2f}")
-        
-        # Distribución por semestre
-        st.markdown("#### :material/school: Horas por Semestre")
-        horas_semestre = df_filtrado.groupby('semestre')['horas'].sum().reset_index()
-        
-        fig = px.bar(
-            horas_semestre,
-            x='semestre',
-            y='horas',
-            title='Total de Horas por Semestre',
-            labels={'semestre': 'Semestre', 'horas': 'Total Horas'},
-            color='horas',
-            color_continuous_scale='Viridis'
-        )
-        fig.update_xaxes(type='category')
-        st.plotly_chart(fig, use_container_width=True)
+        _tab_distribucion(filtros)
     
     # Botón de exportar
     st.divider()
@@ -426,28 +652,18 @@ try:
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        csv_data = df_filtrado.to_csv(index=False).encode('utf-8-sig')
         st.download_button(
             label=":material/table: Exportar Datos Filtrados (CSV)",
-            data=csv_data,
+            data=csv_filtrado(filtros),
             file_name=f"dashboard_datos_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
             mime="text/csv",
             use_container_width=True
         )
     
     with col2:
-        resumen = {
-            'Total Horas': df_filtrado['horas'].sum(),
-            'Total Registros': len(df_filtrado),
-            'Promedio Horas': df_filtrado['horas'].mean(),
-            'Horas Validadas': df_filtrado[df_filtrado['validado'] == True]['horas'].sum(),
-            'Pendientes': len(df_filtrado[df_filtrado['validado'] == False])
-        }
-        resumen_df = pd.DataFrame([resumen])
-        resumen_csv = resumen_df.to_csv(index=False).encode('utf-8-sig')
         st.download_button(
             label=":material/summarize: Exportar Resumen",
-            data=resumen_csv,
+            data=csv_resumen(filtros),
             file_name=f"dashboard_resumen_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
             mime="text/csv",
             use_container_width=True
@@ -455,4 +671,4 @@ try:
 
 except Exception as e:
     st.error(f"Error al cargar los datos: {str(e)}")
-    st.info("Asegúrate de que haya registros en la base de datos.")
\ No newline at end of file
+    st.info("Asegúrate de que haya registros en la base de datos.")
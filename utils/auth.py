@@ -3,11 +3,45 @@ Autenticación local basada en la tabla usuarios.
 Incluye renderizado de sidebar con logo y Material Icons.
 """
 import os
-from typing import Iterable, Optional
+from typing import Collection, Optional
 import streamlit as st
 from utils.db import verify_user
 
-SESSION_KEYS = ["auth", "user", "role", "alumno_id"]
+SESSION_KEYS = ["auth", "user", "role", "alumno_id", "_ms_auth_url"]
+
+# Enlaces de navegación por rol (página, etiqueta); se arman una sola vez al importar
+_INICIO = ("0_Inicio.py", ":material/home: Inicio")
+_DEFAULT_NAV = (_INICIO,)
+_NAV_REVISORES = (
+    _INICIO,
+    ("pages/3_Registros.py", ":material/app_registration: Registros"),
+    ("pages/4_Validacion.py", ":material/check_box: Validación"),
+    ("pages/6_Dashboard.py", ":material/dashboard: Dashboard"),
+)
+_NAV = {
+    'Admin': (
+        _INICIO,
+        ("pages/1_Alumnos.py", ":material/group: Alumnos"),
+        ("pages/2_Lugares.py", ":material/domain: Lugares"),
+        ("pages/3_Registros.py", ":material/app_registration: Registros"),
+        ("pages/4_Validacion.py", ":material/check_box: Validación"),
+        ("pages/5_Administradores.py", ":material/admin_panel_settings: Administradores"),
+        ("pages/6_Dashboard.py", ":material/dashboard: Dashboard"),
+    ),
+    'Estudiante': (
+        _INICIO,
+        ("pages/3_Registros.py", ":material/app_registration: Mis Registros"),
+    ),
+    'Empresa': _NAV_REVISORES,
+    'Departamento': _NAV_REVISORES,
+    'Docente': _NAV_REVISORES,
+}
+
+# Campo de la sesión en el sidebar: etiqueta en negrita + valor indentado
+_FIELD_TMPL = (
+    "**{}**\n\n"
+    "<div style='margin-left: 1.8rem; margin-top: -0.5rem; margin-bottom: 0.8rem;'>{}</div>\n\n"
+)
 
 
 def login(user: str, password: str) -> bool:
@@ -55,14 +89,14 @@ def current_alumno_id() -> Optional[int]:
     return st.session_state.get("alumno_id")
 
 
-def has_role(roles: Iterable[str]) -> bool:
+def has_role(roles: Collection[str]) -> bool:
     """
     Retorna True si el usuario autenticado posee alguno de los roles indicados.
+    Se consulta la colección tal cual (tupla o set), sin copiarla en cada llamada.
     """
     if not is_logged():
         return False
-    r = current_role()
-    return r in set(roles)
+    return current_role() in roles
 
 
 def require_login() -> None:
@@ -74,34 +108,36 @@ def require_login() -> None:
         st.stop()
 
 
+def _resolve_logo_paths() -> tuple:
+    """
+    (logo, icono) de assets/ si existen, o None. Se resuelve una vez al importar:
+    los archivos no cambian durante la vida del proceso.
+    """
+    logo_path = os.path.join("assets", "logo.png")
+    icon_path = os.path.join("assets", "icon.png")
+    return (
+        logo_path if os.path.exists(logo_path) else None,
+        icon_path if os.path.exists(icon_path) else None,
+    )
+
+
+_LOGO_PATHS = _resolve_logo_paths()
+
+
 def _render_logo_in_sidebar() -> None:
     """
     Renderiza un logo en la barra lateral usando st.logo().
-    Busca assets/logo.png para el logo principal y assets/icon.png para el icono.
+    Usa assets/logo.png para el logo principal y assets/icon.png para el icono.
     Compatible con la API de st.logo() según la documentación oficial.
     """
-    logo_path = os.path.join("assets", "logo.png")
-    icon_path = os.path.join("assets", "icon.png")
-    
-    # Verificar si existen los archivos
-    logo_exists = os.path.exists(logo_path)
-    icon_exists = os.path.exists(icon_path)
-    
-    if logo_exists:
+    logo_path, icon_path = _LOGO_PATHS
+    if logo_path:
         # st.logo() acepta:
         # - image: ruta al archivo o URL del logo principal
         # - link: URL opcional para hacer el logo clickeable
-        # - icon_image: ruta al archivo o URL del icono (versión compacta)
+        # - icon_image: ruta al archivo o URL del icono (versión compacta; None = sólo logo)
         try:
-            if icon_exists:
-                # Usar ambos: logo principal e icono
-                st.logo(
-                    image=logo_path,
-                    icon_image=icon_path
-                )
-            else:
-                # Solo logo principal
-                st.logo(image=logo_path)
+            st.logo(image=logo_path, icon_image=icon_path)
         except Exception as e:
             # Fallback silencioso si hay algún problema
             st.sidebar.caption(f"⚠️ Error al cargar logo: {e}")
@@ -125,43 +161,21 @@ def render_userbox() -> None:
             rol = current_role()
             
             # Mostrar páginas según el rol del usuario
-            if rol == 'Admin':
-                st.page_link("0_Inicio.py", label=":material/home: Inicio")
-                st.page_link("pages/1_Alumnos.py", label=":material/group: Alumnos")
-                st.page_link("pages/2_Lugares.py", label=":material/domain: Lugares")
-                st.page_link("pages/3_Registros.py", label=":material/app_registration: Registros")
-                st.page_link("pages/4_Validacion.py", label=":material/check_box: Validación")
-                st.page_link("pages/5_Administradores.py", label=":material/admin_panel_settings: Administradores")
-                st.page_link("pages/6_Dashboard.py", label=":material/dashboard: Dashboard")
-            elif rol == 'Estudiante':
-                st.page_link("0_Inicio.py", label=":material/home: Inicio")
-                st.page_link("pages/3_Registros.py", label=":material/app_registration: Mis Registros")
-            elif rol in ['Empresa', 'Departamento', 'Docente']:
-                st.page_link("0_Inicio.py", label=":material/home: Inicio")
-                st.page_link("pages/3_Registros.py", label=":material/app_registration: Registros")
-                st.page_link("pages/4_Validacion.py", label=":material/check_box: Validación")
-                st.page_link("pages/6_Dashboard.py", label=":material/dashboard: Dashboard")
-            else:
-                st.page_link("0_Inicio.py", label=":material/home: Inicio")
+            for page, label in _NAV.get(rol, _DEFAULT_NAV):
+                st.page_link(page, label=label)
             
             st.divider()
             
             # Información de sesión al final
             st.caption("SESIÓN ACTIVA")
             
-            # Usuario
-            st.markdown(f"**:material/person: Usuario**")
-            st.markdown(f"<div style='margin-left: 1.8rem; margin-top: -0.5rem; margin-bottom: 0.8rem;'>{current_user()}</div>", unsafe_allow_html=True)
-
-            # Rol
-            st.markdown(f"**:material/verified_user: Rol**")
-            st.markdown(f"<div style='margin-left: 1.8rem; margin-top: -0.5rem; margin-bottom: 0.8rem;'>{current_role()}</div>", unsafe_allow_html=True)
-
-            # alumno_id si existe
+            # Usuario, rol y alumno_id (si existe) en un solo elemento markdown
+            campos = _FIELD_TMPL.format(":material/person: Usuario", current_user())
+            campos += _FIELD_TMPL.format(":material/verified_user: Rol", rol)
             alumno_id = current_alumno_id()
             if alumno_id is not None:
-                st.markdown(f"**:material/school: Alumno ID**")
-                st.markdown(f"<div style='margin-left: 1.8rem; margin-top: -0.5rem; margin-bottom: 0.8rem;'>{alumno_id}</div>", unsafe_allow_html=True)
+                campos += _FIELD_TMPL.format(":material/school: Alumno ID", alumno_id)
+            st.markdown(campos, unsafe_allow_html=True)
             
             st.divider()
             
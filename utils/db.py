@@ -12,79 +12,123 @@ import json
 import hmac
 import hashlib
 import base64
+from functools import lru_cache
 from datetime import date, datetime
-from typing import Optional, Tuple, Dict, Any
+from decimal import Decimal
+from typing import Optional, Tuple, Dict, Any, Iterable, Sequence
 
 import duckdb
 import pandas as pd
+import streamlit as st
+
+try:
+    # PBKDF2 en C (opcional); misma firma y mismo resultado que hashlib
+    from fastpbkdf2 import pbkdf2_hmac as _pbkdf2_hmac
+except ImportError:
+    _pbkdf2_hmac = hashlib.pbkdf2_hmac
 
 DB_PATH = os.getenv("EXT_DB_PATH", os.path.join("data", "extension.duckdb"))
 
 # Asegurar carpeta
 os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
 
-# Conexión única por proceso
-_con = None
+# Versión del esquema que crea init_db; subirla al cambiar tablas, índices o secuencias
+SCHEMA_VERSION = 1
 
 # ------------------ Utilidades internas ------------------
 
+# Hash de PBKDF2 para contraseñas nuevas. SHA-512 trabaja con palabras de 64 bits:
+# en CPUs de 64 bits cuesta lo mismo que SHA-256 al verificar pero es más caro en GPU.
+# Las filas antiguas guardan 'sha256' en usuarios.algo y se siguen verificando.
+_PBKDF2_ALGO = 'sha512'
+
+
 def _pbkdf2_hash(password: str, salt: bytes = None, iterations: int = 100_000) -> Dict[str, Any]:
-    """Devuelve diccionario con salt, iteraciones y hash (base64)."""
+    """Devuelve diccionario con salt, iteraciones, algoritmo y hash (base64)."""
     if salt is None:
         salt = os.urandom(16)
-    dk = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+    dk = _pbkdf2_hmac(_PBKDF2_ALGO, password.encode('utf-8'), salt, iterations)
     return {
         'salt_b64': base64.b64encode(salt).decode('ascii'),
         'iters': iterations,
+        'algo': _PBKDF2_ALGO,
         'hash_b64': base64.b64encode(dk).decode('ascii')
     }
 
 
-def _pbkdf2_verify(password: str, salt_b64: str, iters: int, hash_b64: str) -> bool:
+def _pbkdf2_verify(password: str, salt_b64: str, iters: int, hash_b64: str, algo: str = 'sha256') -> bool:
     salt = base64.b64decode(salt_b64.encode('ascii'))
     expected = base64.b64decode(hash_b64.encode('ascii'))
-    dk = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iters)
+    dk = _pbkdf2_hmac(algo, password.encode('utf-8'), salt, iters)
     return hmac.compare_digest(dk, expected)
 
 
-def _serialize_for_json(obj: Any) -> Any:
+@lru_cache(maxsize=1)
+def _dummy_hash() -> Dict[str, Any]:
+    """Hash fijo para igualar tiempos cuando el usuario no existe (se calcula una sola vez)."""
+    return _pbkdf2_hash("x", salt=b"\0" * 16)
+
+
+def _json_default(obj: Any) -> Any:
     """
-    Convierte objetos no serializables a formatos JSON compatibles.
-    Maneja Timestamp de pandas, datetime, date, etc.
+    Conversión de los valores que json.dumps no sabe serializar (Timestamp de pandas,
+    datetime, date, Decimal, etc.). El recorrido de dicts/listas lo hace json en C.
     """
-    if isinstance(obj, dict):
-        return {k: _serialize_for_json(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [_serialize_for_json(item) for item in obj]
-    elif isinstance(obj, (pd.Timestamp)):
-        return obj.isoformat()
-    elif isinstance(obj, (datetime, date)):
+    if obj is pd.NaT:
+        return None
+    if isinstance(obj, (pd.Timestamp, datetime, date)):
         return obj.isoformat()
-    elif isinstance(obj, (pd.Series)):
-        return _serialize_for_json(obj.to_dict())
-    elif isinstance(obj, (pd.DataFrame)):
+    if isinstance(obj, Decimal):
+        # DECIMAL de DuckDB (p. ej. horas) al leer filas como tuplas
+        return float(obj)
+    if isinstance(obj, pd.Series):
+        return obj.to_dict()
+    if isinstance(obj, pd.DataFrame):
         return obj.to_dict('records')
-    elif pd.isna(obj):
+    if pd.isna(obj):
         return None
-    else:
-        return obj
+    # Escalares de numpy (int64, bool_, ...)
+    if hasattr(obj, 'item'):
+        return obj.item()
+    raise TypeError(f"Objeto de tipo {type(obj).__name__} no serializable a JSON")
+
+
+@st.cache_resource(show_spinner=False)
+def _shared_con():
+    """
+    Conexión única por proceso (recurso compartido de Streamlit).
+    El esquema se inicializa sólo al crearla, no en cada rerun.
+    """
+    con = duckdb.connect(DB_PATH)
+    con.execute(f"PRAGMA threads={os.cpu_count() or 4};")
+    init_db(con)
+    return con
 
 
 def get_con():
-    global _con
-    if _con is None:
-        _con = duckdb.connect(DB_PATH)
-        _con.execute("PRAGMA threads=4;")
-        init_db(_con)
-    return _con
+    """
+    Cursor sobre la conexión compartida. Un objeto de conexión DuckDB no debe usarse
+    desde varios hilos a la vez; cada llamada obtiene su propio cursor (mismo catálogo
+    y datos), así las sesiones concurrentes de Streamlit no se serializan en un handle.
+    """
+    return _shared_con().cursor()
 
 
 # ------------------ Inicialización de BD ------------------
 
 def init_db(con=None):
-    """Crea tablas si no existen y semilla usuarios DEMO si están vacías."""
+    """
+    Crea tablas si no existen y semilla usuarios DEMO si están vacías.
+    Si la BD ya está en SCHEMA_VERSION no hace nada (evita repetir el DDL en cada arranque).
+    """
     con = con or get_con()
 
+    # DuckDB no tiene PRAGMA user_version: la versión se guarda en schema_meta
+    con.execute("CREATE TABLE IF NOT EXISTS schema_meta (version INTEGER NOT NULL);")
+    row = con.execute("SELECT MAX(version) FROM schema_meta").fetchone()
+    if row[0] == SCHEMA_VERSION:
+        return
+
     # Alumnos con borrado lógico
     con.execute(
         """
@@ -149,18 +193,56 @@ def init_db(con=None):
         """
         CREATE TABLE IF NOT EXISTS usuarios (
             id INTEGER PRIMARY KEY,
-            username VARCHAR UNIQUE NOT NULL,
+            username VARCHAR UNIQUE NOT NULL,  -- en minúsculas; UNIQUE ya mantiene su índice ART
             role VARCHAR NOT NULL,           -- Estudiante/Empresa/Departamento/Admin
             alumno_id INTEGER,               -- (opcional) link al alumno si rol = Estudiante
             salt_b64 VARCHAR NOT NULL,
             iters INTEGER NOT NULL,
             hash_b64 VARCHAR NOT NULL,
+            algo VARCHAR NOT NULL DEFAULT 'sha256',  -- hash de PBKDF2 (sha256 legado / sha512)
             FOREIGN KEY (alumno_id) REFERENCES alumnos(id)
         );
         """
     )
-
-    # Crear o reiniciar secuencias basándose en el MAX(id) existente
+    # BDs creadas antes de la columna algo: sus hashes son PBKDF2-SHA256
+    con.execute("ALTER TABLE usuarios ADD COLUMN IF NOT EXISTS algo VARCHAR DEFAULT 'sha256';")
+
+    # Resumen de horas por alumno/año/semestre, mantenido en cada escritura
+    # (estado_alumno lo lee con una búsqueda puntual en vez de re-agregar registros)
+    existe_resumen = con.execute(
+        "SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = 'horas_resumen'"
+    ).fetchone()[0]
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS horas_resumen (
+            alumno_id INTEGER NOT NULL,
+            anio INTEGER NOT NULL,
+            semestre INTEGER NOT NULL,
+            total DECIMAL(12,2) NOT NULL DEFAULT 0,
+            validadas DECIMAL(12,2) NOT NULL DEFAULT 0,
+            PRIMARY KEY (alumno_id, anio, semestre)
+        );
+        """
+    )
+    if not existe_resumen:
+        # Primera vez: poblar desde los registros existentes
+        con.execute(
+            """
+            INSERT INTO horas_resumen
+            SELECT alumno_id, anio, semestre,
+                   SUM(horas), SUM(CASE WHEN validado THEN horas ELSE 0 END)
+            FROM registros
+            GROUP BY alumno_id, anio, semestre
+            """
+        )
+
+    # Índices para búsquedas puntuales por alumno/lugar (list_registros, estado_alumno).
+    # DuckDB sólo usa índices ART en igualdades de una columna; para validado (booleano)
+    # los zonemaps ya bastan y no admite índices parciales (WHERE validado = FALSE).
+    con.execute("CREATE INDEX IF NOT EXISTS idx_registros_alumno ON registros(alumno_id);")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_registros_lugar ON registros(lugar_id);")
+
+    # Crear secuencias (sólo la primera vez) basándose en el MAX(id) existente
     _init_sequence(con, 'seq_alumnos', 'alumnos')
     _init_sequence(con, 'seq_lugares', 'lugares')
     _init_sequence(con, 'seq_registros', 'registros')
@@ -168,76 +250,118 @@ def init_db(con=None):
     _init_sequence(con, 'seq_usuarios', 'usuarios')
 
     # Semilla de usuarios si está vacío
-    n_users = con.execute("SELECT COUNT(*) FROM usuarios").fetchone()[0]
-    if n_users == 0:
+    # LIMIT 1 corta en la primera fila en vez de contar la tabla completa
+    hay_usuarios = con.execute("SELECT 1 FROM usuarios LIMIT 1").fetchone()
+    if hay_usuarios is None:
         # Crea 4 usuarios demo (contraseña 1234). Para Estudiante no asignamos alumno aún.
         for uname, role in [("estudiante","Estudiante"),("empresa","Empresa"),("depto","Departamento"),("admin","Admin")]:
             h = _pbkdf2_hash("1234")
             con.execute(
-                "INSERT INTO usuarios (id, username, role, alumno_id, salt_b64, iters, hash_b64) VALUES (nextval('seq_usuarios'),?,?,?,?,?,?)",
-                [uname, role, None, h['salt_b64'], h['iters'], h['hash_b64']]
+                "INSERT INTO usuarios (id, username, role, alumno_id, salt_b64, iters, hash_b64, algo) VALUES (nextval('seq_usuarios'),?,?,?,?,?,?,?)",
+                [uname, role, None, h['salt_b64'], h['iters'], h['hash_b64'], h['algo']]
             )
 
+    con.execute("DELETE FROM schema_meta")
+    con.execute("INSERT INTO schema_meta VALUES (?)", [SCHEMA_VERSION])
+
 
 def _init_sequence(con, seq_name: str, table_name: str) -> None:
     """
-    Crea o reinicia una secuencia basándose en el MAX(id) de la tabla.
-    Esto previene conflictos de primary key.
+    Crea la secuencia sólo si no existe, comenzando en MAX(id) + 1 de la tabla
+    (previene conflictos de primary key). DuckDB persiste el estado de la secuencia,
+    así que en arranques posteriores no se vuelve a escanear la tabla.
     """
-    # Verificar si la secuencia existe
-    try:
-        # Intentar eliminar la secuencia si existe
-        con.execute(f"DROP SEQUENCE IF EXISTS {seq_name};")
-    except Exception:
-        # Si falla, continuar (la secuencia no existe o no se puede eliminar)
-        pass
-    
-    # Obtener el máximo ID actual de la tabla
-    try:
-        max_id = con.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table_name}").fetchone()[0]
-    except Exception:
-        max_id = 0
-    
-    # Crear secuencia comenzando desde max_id + 1
-    start_value = max_id + 1
-    try:
-        con.execute(f"CREATE SEQUENCE IF NOT EXISTS {seq_name} START {start_value};")
-    except Exception:
-        # Si la secuencia ya existe, intentar resetearla
-        try:
-            con.execute(f"ALTER SEQUENCE {seq_name} RESTART WITH {start_value};")
-        except Exception:
-            # Si todo falla, simplemente continuar
-            pass
+    existe = con.execute(
+        "SELECT COUNT(*) FROM duckdb_sequences() WHERE sequence_name = ?", [seq_name]
+    ).fetchone()[0]
+    if existe:
+        return
+    max_id = con.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table_name}").fetchone()[0]
+    con.execute(f"CREATE SEQUENCE IF NOT EXISTS {seq_name} START {max_id + 1};")
 
 
 # ------------------ Auditoría ------------------
 
-def _audit(accion: str, tabla: str, entity_id: int, before: Optional[dict], after: Optional[dict], usuario: Optional[str]):
-    con = get_con()
-    # Serializar los objetos antes de convertir a JSON
-    before_serialized = _serialize_for_json(before) if before else None
-    after_serialized = _serialize_for_json(after) if after else None
-    
-    con.execute(
-        "INSERT INTO auditoria (id, ts, usuario, accion, tabla, entity_id, before_json, after_json) VALUES (nextval('seq_auditoria'), ?, ?, ?, ?, ?, ?, ?)",
-        [
-            datetime.now(), 
-            usuario, 
-            accion, 
-            tabla, 
-            entity_id, 
-            json.dumps(before_serialized) if before_serialized else None, 
-            json.dumps(after_serialized) if after_serialized else None
-        ]
+# Columnas de auditoria en el orden de la tabla, sin id (que se asigna al escribir)
+_AUDIT_COLS = ['ts', 'usuario', 'accion', 'tabla', 'entity_id', 'before_json', 'after_json']
+
+
+def _audit_row(accion: str, tabla: str, entity_id: int, before: Optional[dict], after: Optional[dict],
+               usuario: Optional[str]) -> tuple:
+    """Fila lista para insertar en auditoria (sin id)."""
+    return (
+        datetime.now(),
+        usuario,
+        accion,
+        tabla,
+        entity_id,
+        json.dumps(before, default=_json_default) if before else None,
+        json.dumps(after, default=_json_default) if after else None
     )
 
 
+# Una sola fila: un INSERT con nextval en línea (sin DataFrame ni consulta aparte por el id)
+_AUDIT_INSERT_SQL = (
+    "INSERT INTO auditoria (id, ts, usuario, accion, tabla, entity_id, before_json, after_json) "
+    "VALUES (nextval('seq_auditoria'), ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+def _write_audit(con, rows: Sequence[tuple]) -> None:
+    """
+    Inserta filas de bitácora. Una fila va con un INSERT parametrizado; varias, con el
+    Appender de DuckDB (escritura columnar, sin pasar cada fila por el parser SQL) y
+    los ids reservados en una sola consulta.
+    """
+    if not rows:
+        return
+    if len(rows) == 1:
+        con.execute(_AUDIT_INSERT_SQL, rows[0])
+        return
+    df = pd.DataFrame(rows, columns=_AUDIT_COLS)
+    df.insert(0, 'id', _next_ids(con, 'seq_auditoria', len(rows)))
+    con.append('auditoria', df)
+
+
+def _audit(accion: str, tabla: str, entity_id: int, before: Optional[dict], after: Optional[dict], usuario: Optional[str]):
+    """
+    Escribe una fila de bitácora en el momento (no queda en memoria del proceso).
+    Dentro de una transacción usar _audit_row + _write_audit con su cursor, para que
+    la bitácora se confirme (o revierta) junto con el cambio.
+    """
+    _write_audit(get_con(), [_audit_row(accion, tabla, entity_id, before, after, usuario)])
+
+
 # ------------------ Helpers de IDs ------------------
 
+def _row_as_dict(con, sql: str, params: Sequence[Any]) -> Optional[dict]:
+    """Primera fila de la consulta como dict {columna: valor} (None si no hay filas)."""
+    cur = con.execute(sql, params)
+    row = cur.fetchone()
+    if row is None:
+        return None
+    return dict(zip([c[0] for c in cur.description], row))
+
+
+# SQL de nextval armado una sola vez por secuencia (mismo texto en cada llamada)
+_NEXTVAL_SQL = {
+    seq: f"SELECT nextval('{seq}')"
+    for seq in ('seq_alumnos', 'seq_lugares', 'seq_registros', 'seq_auditoria', 'seq_usuarios')
+}
+# Variante para reservar varios ids de una vez (mismas secuencias)
+_NEXTVAL_RANGE_SQL = {seq: f"{sql} FROM range(?)" for seq, sql in _NEXTVAL_SQL.items()}
+
+
 def _next_id(seq_name: str) -> int:
     con = get_con()
-    return con.execute(f"SELECT nextval('{seq_name}')").fetchone()[0]
+    return con.execute(_NEXTVAL_SQL[seq_name]).fetchone()[0]
+
+
+def _next_ids(con, seq_name: str, n: int) -> list:
+    """Reserva n ids consecutivos de la secuencia en una sola consulta."""
+    if n <= 0:
+        return []
+    return [r[0] for r in con.execute(_NEXTVAL_RANGE_SQL[seq_name], [n]).fetchall()]
 
 
 # ------------------ CRUD Alumnos (con borrado lógico) ------------------
@@ -247,10 +371,13 @@ def insert_alumno(nombre: str, carrera: str, usuario: Optional[str] = None) -> i
     new_id = _next_id('seq_alumnos')
     con.execute("INSERT INTO alumnos (id, nombre, carrera, activo) VALUES (?, ?, ?, TRUE)", [new_id, nombre.strip(), carrera.strip()])
     _audit('INSERT','alumnos', new_id, None, {"id": new_id, "nombre": nombre, "carrera": carrera, "activo": True}, usuario)
+    list_alumnos.clear()
     return new_id
 
 
+@st.cache_data(ttl=60, show_spinner=False)
 def list_alumnos(incluir_inactivos: bool = False) -> pd.DataFrame:
+    """Catálogo de alumnos, cacheado entre reruns; toda escritura lo invalida."""
     con = get_con()
     if incluir_inactivos:
         return con.execute("SELECT id, nombre, carrera, activo FROM alumnos ORDER BY id").df()
@@ -260,26 +387,38 @@ def list_alumnos(incluir_inactivos: bool = False) -> pd.DataFrame:
 
 def soft_delete_alumno(alumno_id: int, usuario: Optional[str] = None) -> None:
     con = get_con()
-    before = con.execute("SELECT id, nombre, carrera, activo FROM alumnos WHERE id=?", [alumno_id]).fetchone()
-    if not before:
+    before_d = _row_as_dict(con, "SELECT id, nombre, carrera, activo FROM alumnos WHERE id=?", [alumno_id])
+    if not before_d:
         return
-    before_d = {"id": before[0], "nombre": before[1], "carrera": before[2], "activo": before[3]}
     con.execute("UPDATE alumnos SET activo = FALSE WHERE id = ?", [alumno_id])
     after_d = dict(before_d)
     after_d['activo'] = False
     _audit('DELETE','alumnos', alumno_id, before_d, after_d, usuario)
+    list_alumnos.clear()
+    list_registros_todos.clear()
 
 
 def restore_alumno(alumno_id: int, usuario: Optional[str] = None) -> None:
     con = get_con()
-    before = con.execute("SELECT id, nombre, carrera, activo FROM alumnos WHERE id=?", [alumno_id]).fetchone()
-    if not before:
+    before_d = _row_as_dict(con, "SELECT id, nombre, carrera, activo FROM alumnos WHERE id=?", [alumno_id])
+    if not before_d:
         return
-    before_d = {"id": before[0], "nombre": before[1], "carrera": before[2], "activo": before[3]}
     con.execute("UPDATE alumnos SET activo = TRUE WHERE id = ?", [alumno_id])
     after_d = dict(before_d)
     after_d['activo'] = True
     _audit('UPDATE','alumnos', alumno_id, before_d, after_d, usuario)
+    list_alumnos.clear()
+    list_registros_todos.clear()
+
+
+def soft_delete_alumnos_bulk(ids: Iterable[int], usuario: Optional[str] = None) -> int:
+    """Desactiva varios alumnos en una sola transacción. Devuelve cuántos se afectaron."""
+    return _set_activo_bulk('alumnos', ('id', 'nombre', 'carrera', 'activo'), ids, False, 'DELETE', usuario)
+
+
+def restore_alumnos_bulk(ids: Iterable[int], usuario: Optional[str] = None) -> int:
+    """Restaura varios alumnos en una sola transacción. Devuelve cuántos se afectaron."""
+    return _set_activo_bulk('alumnos', ('id', 'nombre', 'carrera', 'activo'), ids, True, 'UPDATE', usuario)
 
 
 # ------------------ CRUD Lugares (con borrado lógico) ------------------
@@ -289,10 +428,13 @@ def insert_lugar(nombre: str, usuario: Optional[str] = None) -> int:
     new_id = _next_id('seq_lugares')
     con.execute("INSERT INTO lugares (id, nombre, activo) VALUES (?, ?, TRUE)", [new_id, nombre.strip()])
     _audit('INSERT','lugares', new_id, None, {"id": new_id, "nombre": nombre, "activo": True}, usuario)
+    list_lugares.clear()
     return new_id
 
 
+@st.cache_data(ttl=60, show_spinner=False)
 def list_lugares(incluir_inactivos: bool = False) -> pd.DataFrame:
+    """Catálogo de lugares, cacheado entre reruns; toda escritura lo invalida."""
     con = get_con()
     if incluir_inactivos:
         return con.execute("SELECT id, nombre, activo FROM lugares ORDER BY id").df()
@@ -302,51 +444,114 @@ def list_lugares(incluir_inactivos: bool = False) -> pd.DataFrame:
 
 def soft_delete_lugar(lugar_id: int, usuario: Optional[str] = None) -> None:
     con = get_con()
-    before = con.execute("SELECT id, nombre, activo FROM lugares WHERE id=?", [lugar_id]).fetchone()
-    if not before:
+    before_d = _row_as_dict(con, "SELECT id, nombre, activo FROM lugares WHERE id=?", [lugar_id])
+    if not before_d:
         return
-    before_d = {"id": before[0], "nombre": before[1], "activo": before[2]}
     con.execute("UPDATE lugares SET activo = FALSE WHERE id = ?", [lugar_id])
     after_d = dict(before_d)
     after_d['activo'] = False
     _audit('DELETE','lugares', lugar_id, before_d, after_d, usuario)
+    list_lugares.clear()
+    list_registros_todos.clear()
 
 
 def restore_lugar(lugar_id: int, usuario: Optional[str] = None) -> None:
     con = get_con()
-    before = con.execute("SELECT id, nombre, activo FROM lugares WHERE id=?", [lugar_id]).fetchone()
-    if not before:
+    before_d = _row_as_dict(con, "SELECT id, nombre, activo FROM lugares WHERE id=?", [lugar_id])
+    if not before_d:
         return
-    before_d = {"id": before[0], "nombre": before[1], "activo": before[2]}
     con.execute("UPDATE lugares SET activo = TRUE WHERE id = ?", [lugar_id])
     after_d = dict(before_d)
     after_d['activo'] = True
     _audit('UPDATE','lugares', lugar_id, before_d, after_d, usuario)
+    list_lugares.clear()
+    list_registros_todos.clear()
+
+
+def soft_delete_lugares_bulk(ids: Iterable[int], usuario: Optional[str] = None) -> int:
+    """Desactiva varios lugares en una sola transacción. Devuelve cuántos se afectaron."""
+    return _set_activo_bulk('lugares', ('id', 'nombre', 'activo'), ids, False, 'DELETE', usuario)
+
+
+def restore_lugares_bulk(ids: Iterable[int], usuario: Optional[str] = None) -> int:
+    """Restaura varios lugares en una sola transacción. Devuelve cuántos se afectaron."""
+    return _set_activo_bulk('lugares', ('id', 'nombre', 'activo'), ids, True, 'UPDATE', usuario)
+
+
+def _set_activo_bulk(tabla: str, columnas: Sequence[str], ids: Iterable[int], activo: bool,
+                     accion: str, usuario: Optional[str]) -> int:
+    """
+    Cambia el campo "activo" de varias filas con un único UPDATE dentro de una
+    transacción, auditando cada fila afectada.
+    """
+    ids = [int(i) for i in ids]
+    if not ids:
+        return 0
+    con = get_con()
+    cols_sql = ", ".join(columnas)
+    con.begin()
+    try:
+        rows = con.execute(f"SELECT {cols_sql} FROM {tabla} WHERE id IN (SELECT unnest(?)) ORDER BY id", [ids]).fetchall()
+        con.execute(f"UPDATE {tabla} SET activo = ? WHERE id IN (SELECT unnest(?))", [activo, ids])
+        filas = []
+        for row in rows:
+            before_d = dict(zip(columnas, row))
+            after_d = dict(before_d)
+            after_d['activo'] = activo
+            filas.append(_audit_row(accion, tabla, before_d['id'], before_d, after_d, usuario))
+        _write_audit(con, filas)
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    (list_alumnos if tabla == 'alumnos' else list_lugares).clear()
+    list_registros_todos.clear()
+    return len(rows)
 
 
 # ------------------ Registros ------------------
 
 def insert_registro(alumno_id: int, lugar_id: int, actividad: str, fecha: date, horas: float, anio: int, semestre: int, usuario: Optional[str] = None) -> int:
+    """Inserta el registro, actualiza horas_resumen y audita en una sola transacción."""
     con = get_con()
     new_id = _next_id('seq_registros')
-    con.execute(
-        """
-        INSERT INTO registros
-        (id, alumno_id, lugar_id, actividad, fecha, horas, anio, semestre, validado, validador)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, FALSE, NULL)
-        """,
-        [new_id, alumno_id, lugar_id, actividad.strip(), str(fecha), float(horas), int(anio), int(semestre)]
-    )
-    _audit('INSERT','registros', new_id, None, {
-        "id": new_id, "alumno_id": alumno_id, "lugar_id": lugar_id,
-        "actividad": actividad, "fecha": str(fecha), "horas": float(horas),
-        "anio": int(anio), "semestre": int(semestre), "validado": False, "validador": None
-    }, usuario)
+    con.begin()
+    try:
+        con.execute(
+            """
+            INSERT INTO registros
+            (id, alumno_id, lugar_id, actividad, fecha, horas, anio, semestre, validado, validador)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, FALSE, NULL)
+            """,
+            [new_id, alumno_id, lugar_id, actividad.strip(), str(fecha), float(horas), int(anio), int(semestre)]
+        )
+        con.execute(
+            """
+            INSERT INTO horas_resumen (alumno_id, anio, semestre, total, validadas) VALUES (?, ?, ?, ?, 0)
+            ON CONFLICT (alumno_id, anio, semestre) DO UPDATE SET total = horas_resumen.total + excluded.total
+            """,
+            [alumno_id, int(anio), int(semestre), float(horas)]
+        )
+        _write_audit(con, [_audit_row('INSERT','registros', new_id, None, {
+            "id": new_id, "alumno_id": alumno_id, "lugar_id": lugar_id,
+            "actividad": actividad, "fecha": str(fecha), "horas": float(horas),
+            "anio": int(anio), "semestre": int(semestre), "validado": False, "validador": None
+        }, usuario)])
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    list_registros_todos.clear()
     return new_id
 
 
 def list_registros(pendientes: bool = False, alumno_id: Optional[int] = None,
-                   anio: Optional[int] = None, semestre: Optional[int] = None, incluir_inactivos: bool = False) -> pd.DataFrame:
+                   anio: Optional[int] = None, semestre: Optional[int] = None, incluir_inactivos: bool = False,
+                   limit: Optional[int] = None, offset: int = 0, count_only: bool = False):
+    """
+    Lista registros con filtros opcionales. Con limit/offset pagina en el servidor;
+    con count_only=True devuelve sólo la cantidad (int) de registros que cumplen el filtro.
+    """
     con = get_con()
     where = []
     params = []
@@ -364,44 +569,113 @@ def list_registros(pendientes: bool = False, alumno_id: Optional[int] = None,
     if not incluir_inactivos:
         where.append("a.activo = TRUE AND l.activo = TRUE")
     where_sql = (" WHERE " + " AND ".join(where)) if where else ""
+    from_sql = """
+        FROM registros r
+        JOIN alumnos a ON a.id = r.alumno_id
+        JOIN lugares l ON l.id = r.lugar_id
+    """
+    if count_only:
+        return con.execute(f"SELECT COUNT(*) {from_sql} {where_sql}", params).fetchone()[0]
     sql = f"""
         SELECT r.id, a.nombre AS alumno, l.nombre AS lugar, r.actividad, r.fecha,
                r.horas, r.anio, r.semestre, r.validado, r.validador,
                r.alumno_id, r.lugar_id
-        FROM registros r
-        JOIN alumnos a ON a.id = r.alumno_id
-        JOIN lugares l ON l.id = r.lugar_id
+        {from_sql}
         {where_sql}
         ORDER BY r.fecha DESC, r.id DESC
     """
+    if limit is not None:
+        sql += " LIMIT ? OFFSET ?"
+        params += [int(limit), int(offset)]
     return con.execute(sql, params).df()
 
 
+@st.cache_data(ttl=60, show_spinner=False)
+def list_registros_todos() -> pd.DataFrame:
+    """Todos los registros (export global), cacheado; toda escritura que los afecta lo invalida."""
+    return list_registros()
+
+
 def validar_registro(registro_id: int, validador: str, usuario: Optional[str] = None) -> None:
+    """Valida un registro en una transacción (UPDATE, horas_resumen y auditoría juntos)."""
     con = get_con()
-    before = con.execute("SELECT * FROM registros WHERE id=?", [registro_id]).fetchdf()
-    con.execute("UPDATE registros SET validado = TRUE, validador = ? WHERE id = ?", [validador.strip(), registro_id])
-    after = con.execute("SELECT * FROM registros WHERE id=?", [registro_id]).fetchdf()
-    
-    # Convertir DataFrames a dicts y serializar
-    before_dict = before.iloc[0].to_dict() if not before.empty else None
-    after_dict = after.iloc[0].to_dict() if not after.empty else None
-    
-    _audit('VALIDAR','registros', registro_id, before_dict, after_dict, usuario)
+    con.begin()
+    try:
+        before_dict = _row_as_dict(con, "SELECT * FROM registros WHERE id=?", [registro_id])
+        _resumen_sumar_validadas(con, [registro_id])
+        # UPDATE ... RETURNING devuelve el estado posterior sin otro SELECT (ni DataFrames)
+        after_dict = _row_as_dict(
+            con,
+            "UPDATE registros SET validado = TRUE, validador = ? WHERE id = ? RETURNING *",
+            [validador.strip(), registro_id]
+        )
+        _write_audit(con, [_audit_row('VALIDAR','registros', registro_id, before_dict, after_dict, usuario)])
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    list_registros_todos.clear()
 
 
-def estado_alumno(alumno_id: int, anio: int, semestre: int) -> Tuple[float, float]:
+def validar_registros_bulk(ids: Iterable[int], validador: str, usuario: Optional[str] = None) -> int:
+    """Valida varios registros con un único UPDATE en una transacción. Devuelve cuántos se afectaron."""
+    ids = [int(i) for i in ids]
+    if not ids:
+        return 0
     con = get_con()
-    row = con.execute(
+    validador = validador.strip()
+    con.begin()
+    try:
+        # Tuplas (no DataFrame): los NULL llegan como None y no como NaN, que json no convierte
+        before = con.execute("SELECT * FROM registros WHERE id IN (SELECT unnest(?)) ORDER BY id", [ids]).fetchall()
+        cols = [d[0] for d in con.description]
+        _resumen_sumar_validadas(con, ids)
+        con.execute("UPDATE registros SET validado = TRUE, validador = ? WHERE id IN (SELECT unnest(?))", [validador, ids])
+        filas = []
+        for row in before:
+            before_d = dict(zip(cols, row))
+            after_d = dict(before_d)
+            after_d['validado'] = True
+            after_d['validador'] = validador
+            filas.append(_audit_row('VALIDAR','registros', before_d['id'], before_d, after_d, usuario))
+        _write_audit(con, filas)
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    list_registros_todos.clear()
+    return len(before)
+
+
+def _resumen_sumar_validadas(con, ids: Sequence[int]) -> None:
+    """
+    Suma a horas_resumen.validadas las horas de los registros de ids que aún no están
+    validados. Debe llamarse antes del UPDATE que los marca como validados.
+    """
+    con.execute(
         """
-        SELECT 
-          COALESCE(SUM(horas), 0) AS total,
-          COALESCE(SUM(CASE WHEN validado THEN horas ELSE 0 END), 0) AS validadas
-        FROM registros
-        WHERE alumno_id = ? AND anio = ? AND semestre = ?
+        UPDATE horas_resumen AS h SET validadas = h.validadas + d.horas
+        FROM (
+            SELECT alumno_id, anio, semestre, SUM(horas) AS horas
+            FROM registros
+            WHERE id IN (SELECT unnest(?)) AND validado = FALSE
+            GROUP BY alumno_id, anio, semestre
+        ) AS d
+        WHERE h.alumno_id = d.alumno_id AND h.anio = d.anio AND h.semestre = d.semestre
         """,
+        [list(ids)]
+    )
+
+
+def estado_alumno(alumno_id: int, anio: int, semestre: int) -> Tuple[float, float]:
+    """(total, validadas) del alumno en el periodo, leído de horas_resumen."""
+    con = get_con()
+    row = con.execute(
+        "SELECT total, validadas FROM horas_resumen WHERE alumno_id = ? AND anio = ? AND semestre = ?",
         [alumno_id, anio, semestre]
     ).fetchone()
+    if not row:
+        return 0.0, 0.0
     return float(row[0]), float(row[1])
 
 
@@ -413,8 +687,8 @@ def create_user(username: str, password: str, role: str, alumno_id: Optional[int
     new_id = _next_id('seq_usuarios')
     h = _pbkdf2_hash(password)
     con.execute(
-        "INSERT INTO usuarios (id, username, role, alumno_id, salt_b64, iters, hash_b64) VALUES (?,?,?,?,?,?,?)",
-        [new_id, username.strip().lower(), role, alumno_id, h['salt_b64'], h['iters'], h['hash_b64']]
+        "INSERT INTO usuarios (id, username, role, alumno_id, salt_b64, iters, hash_b64, algo) VALUES (?,?,?,?,?,?,?,?)",
+        [new_id, username.strip().lower(), role, alumno_id, h['salt_b64'], h['iters'], h['hash_b64'], h['algo']]
     )
     _audit('INSERT','usuarios', new_id, None, {"username": username, "role": role, "alumno_id": alumno_id}, username)
     return new_id
@@ -423,10 +697,20 @@ def create_user(username: str, password: str, role: str, alumno_id: Optional[int
 def verify_user(username: str, password: str) -> Optional[dict]:
     """Verifica credenciales y devuelve dict con info del usuario si es válido."""
     con = get_con()
-    row = con.execute("SELECT id, username, role, alumno_id, salt_b64, iters, hash_b64 FROM usuarios WHERE username = ?", [username.strip().lower()]).fetchone()
+    row = con.execute("SELECT id, username, role, alumno_id, salt_b64, iters, hash_b64, algo FROM usuarios WHERE username = ?", [username.strip().lower()]).fetchone()
     if not row:
+        # Mismo costo PBKDF2 que un usuario existente: no revelar qué usuarios existen
+        d = _dummy_hash()
+        _pbkdf2_verify(password, d['salt_b64'], d['iters'], d['hash_b64'], d['algo'])
         return None
-    ok = _pbkdf2_verify(password, row[4], int(row[5]), row[6])
+    ok = _pbkdf2_verify(password, row[4], int(row[5]), row[6], row[7] or 'sha256')
     if not ok:
         return None
+    if row[7] != _PBKDF2_ALGO:
+        # Contraseña correcta con hash legado: re-hashear con el algoritmo actual
+        h = _pbkdf2_hash(password)
+        con.execute(
+            "UPDATE usuarios SET salt_b64 = ?, iters = ?, hash_b64 = ?, algo = ? WHERE id = ?",
+            [h['salt_b64'], h['iters'], h['hash_b64'], h['algo'], row[0]]
+        )
     return {"id": row[0], "username": row[1], "role": row[2], "alumno_id": row[3]}
\ No newline at end of file
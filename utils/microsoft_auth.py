@@ -4,30 +4,53 @@ Versión con Material Symbols y gestión de admins.
 """
 import streamlit as st
 import requests
-from typing import Optional, Dict, List
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Optional, Dict, List, Iterable, Tuple
 import os
 import re
 import secrets
+from functools import lru_cache
 import hashlib
-import base64
 from urllib.parse import urlencode, quote
 
-# Intentar cargar .env solo si existe (desarrollo local)
 try:
-    from dotenv import load_dotenv
-    load_dotenv()
-except:
-    pass
+    # base64 con SIMD (opcional); misma API y mismo resultado que base64
+    from pybase64 import urlsafe_b64encode as _urlsafe_b64encode, urlsafe_b64decode as _urlsafe_b64decode
+except ImportError:
+    from base64 import urlsafe_b64encode as _urlsafe_b64encode, urlsafe_b64decode as _urlsafe_b64decode
+
+try:
+    # JSON en C (opcional); acepta bytes y sus errores son ValueError, igual que json
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
+
+# Cargar .env solo si existe (desarrollo local); si no hay, ni se importa dotenv
+if os.path.exists(".env"):
+    try:
+        from dotenv import load_dotenv
+        load_dotenv(".env")
+    except ImportError:
+        pass
+
+def _load_secrets() -> dict:
+    """Copia de st.secrets leída una sola vez (vacía si no hay secrets.toml)."""
+    try:
+        return dict(st.secrets)
+    except Exception:
+        return {}
+
+
+_SECRETS = _load_secrets()
+
 
 # Función helper para obtener variables de entorno o secrets de Streamlit
+@lru_cache(maxsize=32)
 def _get_config(key: str, default: str = "") -> str:
     """Obtiene config desde st.secrets (Streamlit Cloud) o variables de entorno (local)"""
-    try:
-        # Intentar primero desde Streamlit secrets
-        return st.secrets.get(key, os.getenv(key, default))
-    except:
-        # Fallback a variables de entorno
-        return os.getenv(key, default)
+    # Primero Streamlit secrets; si no está, variables de entorno
+    return _SECRETS.get(key, os.getenv(key, default))
 
 # Configuración OAuth
 CLIENT_ID = _get_config("AZURE_CLIENT_ID", "")
@@ -35,20 +58,63 @@ CLIENT_SECRET = _get_config("AZURE_CLIENT_SECRET", "")
 REDIRECT_URI = _get_config("REDIRECT_URI", "http://localhost:8501")
 TENANT = "common"
 AUTHORITY = f"https://login.microsoftonline.com/{TENANT}"
-SCOPES = ["User.Read"]
+# Panel de depuración OAuth en el sidebar sólo si DEBUG_OAUTH=1 (resuelto al importar)
+_DEBUG_OAUTH = _get_config("DEBUG_OAUTH", "") == "1"
+# openid/profile/email: el token trae un id_token con nombre y correo (evita llamar a Graph)
+SCOPES = ["openid", "profile", "email", "User.Read"]
+# Parte fija de la URL de autorización, codificada una sola vez
+_AUTHORIZE_PREFIX = f"{AUTHORITY}/oauth2/v2.0/authorize?" + urlencode({
+    'client_id': CLIENT_ID,
+    'response_type': 'code',
+    'redirect_uri': REDIRECT_URI,
+    'response_mode': 'query',
+    'scope': ' '.join(SCOPES),
+    'prompt': 'select_account',
+}, quote_via=quote)
 
 # Dominios permitidos de la UVG
-DOMINIOS_PERMITIDOS = ["@uvg.edu.gt"]
+DOMINIOS_PERMITIDOS = ("@uvg.edu.gt",)
+# En minúsculas, para comparar sólo la parte desde la última '@'
+_DOMINIOS_SET = frozenset(d.lower() for d in DOMINIOS_PERMITIDOS)
 
 # Estudiantes con permiso admin por defecto - CORREGIDO
 DEFAULT_ADMIN_STUDENTS = set(s for s in _get_config("MICROSOFT_ADMIN_STUDENTS", "25837,25498, 25675, 25399, 251160").split(",") if s)
+# Copia inmutable compartida por todas las sesiones hasta que una modifique su lista
+_DEFAULT_ADMINS_FROZEN = frozenset(DEFAULT_ADMIN_STUDENTS)
+
+# Patrones de la parte local del email, compilados una vez
+_RE_STUDENT = re.compile(r'([a-zA-Z]+)(2\d+)')   # estudiante: letras + '2' + dígitos
+_RE_NONDIGIT = re.compile(r'\D+')                 # para quitar todo lo que no sea dígito
+
+
+# (conexión, lectura) en segundos: un endpoint lento no bloquea el hilo de Streamlit
+_HTTP_TIMEOUT = (3.05, 10)
+
+
+@st.cache_resource(show_spinner=False)
+def _http_session() -> requests.Session:
+    """
+    Sesión HTTP compartida por el proceso: reutiliza las conexiones TCP/TLS
+    a login.microsoftonline.com y graph.microsoft.com entre logins.
+    """
+    session = requests.Session()
+    # Reintentos con backoff sólo para métodos idempotentes (GET/HEAD, valor por defecto
+    # de Retry): el POST del token no se repite porque el código de autorización es de un uso
+    # No se reintenta 429: su Retry-After podría bloquear el hilo más allá del timeout
+    retry = Retry(total=2, backoff_factor=0.2, status_forcelist=(500, 502, 503, 504))
+    # pool_maxsize acota las conexiones vivas por host (logins concurrentes), no se preasignan
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=20, max_retries=retry)
+    session.mount("https://login.microsoftonline.com", adapter)
+    session.mount("https://graph.microsoft.com", adapter)
+    return session
 
 
 def _generate_pkce_pair():
     """Genera code_verifier y code_challenge (S256)."""
-    code_verifier = secrets.token_urlsafe(64)
-    code_challenge = base64.urlsafe_b64encode(
-        hashlib.sha256(code_verifier.encode()).digest()
+    # 32 bytes aleatorios = 256 bits = 43 caracteres base64url (mínimo de RFC 7636)
+    code_verifier = secrets.token_urlsafe(32)
+    code_challenge = _urlsafe_b64encode(
+        hashlib.sha256(code_verifier.encode('ascii')).digest()
     ).rstrip(b"=").decode("ascii")
     return code_verifier, code_challenge
 
@@ -66,30 +132,18 @@ def get_auth_url() -> str:
         st.error("❌ REDIRECT_URI no configurado")
         return ""
     
-    params = {
-        'client_id': CLIENT_ID,
-        'response_type': 'code',
-        'redirect_uri': REDIRECT_URI,
-        'response_mode': 'query',
-        'scope': ' '.join(SCOPES),
-        'prompt': 'select_account',
-    }
-
     # Generar state aleatorio
     state = secrets.token_urlsafe(16)
-    params['state'] = state
     st.session_state['ms_oauth_state'] = state
+    # state y code_challenge son base64url: no requieren percent-encoding
+    auth_url = f"{_AUTHORIZE_PREFIX}&state={state}"
 
     # Si no hay client secret, habilitar PKCE
     if not CLIENT_SECRET:
         code_verifier, code_challenge = _generate_pkce_pair()
         st.session_state['ms_code_verifier'] = code_verifier
-        params['code_challenge'] = code_challenge
-        params['code_challenge_method'] = 'S256'
+        auth_url += f"&code_challenge={code_challenge}&code_challenge_method=S256"
 
-    # Construir URL manualmente para evitar problemas de encoding
-    auth_url = f"{AUTHORITY}/oauth2/v2.0/authorize?{urlencode(params, quote_via=quote)}"
-    
     return auth_url
 
 
@@ -115,12 +169,18 @@ def exchange_code_for_token(code: str) -> Optional[Dict]:
             data['code_verifier'] = code_verifier
 
     try:
-        response = requests.post(token_url, data=data, timeout=10)
+        response = _http_session().post(token_url, data=data, timeout=_HTTP_TIMEOUT)
         if response.status_code == 200:
-            return response.json()
+            return _json_loads(response.content)
         else:
-            error_data = response.json() if response.headers.get('content-type') == 'application/json' else {}
-            error_msg = error_data.get('error_description', response.text)
+            # Un solo parseo del cuerpo; si no es JSON se muestra tal cual
+            try:
+                error_data = _json_loads(response.content)
+            except ValueError:
+                error_data = {}
+            if not isinstance(error_data, dict):
+                error_data = {}
+            error_msg = error_data.get('error_description') or response.content.decode('utf-8', 'replace')
             st.error(f"❌ Error obteniendo token: {error_msg}")
             
             with st.expander("🔍 Información de debug"):
@@ -141,19 +201,44 @@ Description: {error_msg}
         return None
 
 
+def _user_info_from_id_token(token_result: Dict) -> Optional[Dict]:
+    """
+    Nombre y correo desde los claims del id_token, con las mismas llaves que /me de Graph.
+    No se valida la firma: es seguro sólo porque el id_token llega directo del endpoint
+    de token por TLS (OIDC Core 3.1.3.7), nunca desde el navegador. El correo sale de
+    upn/preferred_username, que administra el tenant; el claim email no se usa porque
+    en algunos tenants el usuario puede editarlo. None si no vienen: entonces se usa Graph.
+    """
+    id_token = token_result.get("id_token")
+    if not id_token:
+        return None
+    try:
+        payload = id_token.split(".")[1]
+        claims = _json_loads(_urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+    except (IndexError, ValueError):
+        return None
+    upn = claims.get("upn") or claims.get("preferred_username")
+    if not upn:
+        return None
+    return {
+        "mail": upn,
+        "userPrincipalName": upn,
+        "displayName": claims.get("name", "Usuario"),
+    }
+
+
 def get_user_info(access_token: str) -> Optional[Dict]:
     """Obtiene información del usuario desde Microsoft Graph API"""
-    headers = {'Authorization': f'Bearer {access_token}'}
-    
+    # Sin caché: cada código se canjea una sola vez, así que el token nunca se repite
     try:
-        response = requests.get(
+        response = _http_session().get(
             'https://graph.microsoft.com/v1.0/me',
-            headers=headers,
-            timeout=10
+            headers={'Authorization': f'Bearer {access_token}'},
+            timeout=_HTTP_TIMEOUT
         )
         
         if response.status_code == 200:
-            return response.json()
+            return _json_loads(response.content)
         else:
             st.error(f"❌ Error obteniendo información del usuario (Status: {response.status_code})")
             return None
@@ -166,40 +251,57 @@ def validar_dominio(email: str) -> bool:
     """Valida que el email termine con un dominio de la UVG"""
     if not email:
         return False
-    
+    # Sin '@' se rechaza sin copiar nada; si hay, sólo se pasa a minúsculas el dominio
+    at = email.rfind('@')
+    return at >= 0 and email[at:].lower() in _DOMINIOS_SET
+
+
+def _parse_email(email: str) -> Optional[Tuple[str, str]]:
+    """(email en minúsculas, parte local) o None si está vacío; se calcula una vez por login."""
+    if not email:
+        return None
     email_lower = email.lower()
-    return any(email_lower.endswith(dominio) for dominio in DOMINIOS_PERMITIDOS)
+    return email_lower, email_lower.partition("@")[0]
 
 
 def determinar_rol(email: str) -> str:
     """Determina el rol basado en el formato del email"""
-    if not email:
-        return "Estudiante"
-    
-    email_lower = email.lower()
-    local = email_lower.split("@")[0]
+    parsed = _parse_email(email)
+    return _rol_desde_local(parsed[1]) if parsed else "Estudiante"
+
+
+def _rol_desde_local(local: str) -> str:
+    """Rol a partir de la parte local (ya en minúsculas) del email."""
+    return _rol_cached(local, get_admin_students())
+
+
+@lru_cache(maxsize=512)
+def _rol_cached(local: str, admin_set: frozenset) -> str:
+    """
+    Memoizado por (parte local, admins). El set de admins es parte de la clave, así que
+    agregar o remover admins no deja resultados obsoletos ni requiere cache_clear().
+    """
+    # Patrón docente: solo letras ASCII (isascii + isalpha equivale a [a-zA-Z]+, sin regex)
+    if local.isascii() and local.isalpha():
+        return "Docente"
     
     # Patrón estudiante: letras seguido de '2' y dígitos
-    m = re.fullmatch(r'([a-zA-Z]+)(2\d+)', local)
+    m = _RE_STUDENT.fullmatch(local)
     if m:
         student_id = m.group(2)
-        admin_set = get_admin_students()
         if student_id in admin_set:
             return "Admin"
-        return "Estudiante"
-    
-    # Patrón docente: solo letras
-    if re.fullmatch(r'[a-zA-Z]+', local):
-        return "Docente"
     
     return "Estudiante"
 
 
-def get_admin_students() -> set:
-    """Devuelve el set de IDs de estudiantes con rol Admin."""
-    if "microsoft_admin_students" not in st.session_state:
-        st.session_state["microsoft_admin_students"] = set(DEFAULT_ADMIN_STUDENTS)
-    return st.session_state["microsoft_admin_students"]
+def get_admin_students() -> frozenset:
+    """
+    Devuelve los IDs de estudiantes con rol Admin. Mientras la sesión no agregue ni
+    remueva admins es el frozenset por defecto, sin copiarlo por sesión; cada cambio
+    guarda un frozenset nuevo en la sesión (copy-on-write, siempre hashable).
+    """
+    return st.session_state.get("microsoft_admin_students", _DEFAULT_ADMINS_FROZEN)
 
 
 def is_current_user_admin() -> bool:
@@ -215,25 +317,34 @@ def microsoft_login_flow() -> bool:
     if st.session_state.get("auth"):
         return True
     
-    # Verificar si hay código en la URL (callback de Microsoft)
-    query_params = st.query_params
+    # Verificar si hay código en la URL (callback de Microsoft); una sola consulta
+    code = st.query_params.get("code")
     
-    if "code" in query_params:
-        code = query_params["code"]
+    if code:
+        # Un rerun puede llegar antes de que query_params.clear() surta efecto: no volver
+        # a canjear un código ya usado (Microsoft lo rechazaría tras otra ida y vuelta)
+        if st.session_state.get("_ms_last_code") == code:
+            st.query_params.clear()
+            return False
+        st.session_state["_ms_last_code"] = code
+        # La URL de login ya se usó: el próximo login genera state/PKCE nuevos
+        st.session_state.pop('_ms_auth_url', None)
         
         with st.spinner("🔄 Verificando credenciales con Microsoft..."):
-            # Intercambiar código por token
+            # Cada código nuevo se canjea: puede venir de otra cuenta distinta a la anterior
             token_result = exchange_code_for_token(code)
             
             if token_result and "access_token" in token_result:
                 access_token = token_result["access_token"]
                 
                 # Obtener información del usuario
-                user_info = get_user_info(access_token)
+                # (desde el id_token si trae los claims; si no, con Graph)
+                user_info = _user_info_from_id_token(token_result) or get_user_info(access_token)
                 
                 if user_info:
-                    # Extraer email
+                    # Extraer email (minúsculas y parte local se calculan una sola vez)
                     email = user_info.get("mail") or user_info.get("userPrincipalName", "")
+                    parsed = _parse_email(email)
                     display_name = user_info.get("displayName", "Usuario")
                     
                     # VALIDAR DOMINIO
@@ -255,13 +366,10 @@ def microsoft_login_flow() -> bool:
                     st.session_state["user"] = email
                     st.session_state["display_name"] = display_name
                     st.session_state["email"] = email
-                    st.session_state["role"] = determinar_rol(email)
+                    st.session_state["role"] = _rol_desde_local(parsed[1]) if parsed else "Estudiante"
                     st.session_state["auth_method"] = "Microsoft"
                     st.session_state["alumno_id"] = None
                     
-                    # Inicializar admins
-                    _ = get_admin_students()
-                    
                     # Limpiar URL
                     st.query_params.clear()
                     
@@ -281,7 +389,7 @@ def render_microsoft_login_button():
     """Renderiza botón con Material Symbol que redirige en la misma pestaña"""
     
     # DEBUG: Mostrar configuración (solo en desarrollo)
-    if st.sidebar.checkbox("🔍 Mostrar configuración OAuth (debug)", value=False):
+    if _DEBUG_OAUTH and st.sidebar.checkbox("🔍 Mostrar configuración OAuth (debug)", value=False):
         with st.sidebar.expander("Configuración actual"):
             st.code(f"""
 CLIENT_ID: {CLIENT_ID[:20]}...{CLIENT_ID[-10:] if CLIENT_ID else 'NO CONFIGURADO'}
@@ -310,8 +418,13 @@ CLIENT_SECRET: {'Configurado ✓' if CLIENT_SECRET else 'No configurado (usando
             """)
         return
     
-    # Generar URL de autenticación
-    auth_url = get_auth_url()
+    # Una URL (state + PKCE) por sesión hasta que se use: no regenerarla en cada rerun,
+    # así el code_verifier guardado coincide con el enlace que el usuario ve
+    auth_url = st.session_state.get('_ms_auth_url')
+    if not auth_url:
+        auth_url = get_auth_url()
+        if auth_url:
+            st.session_state['_ms_auth_url'] = auth_url
     
     if not auth_url:
         st.error("❌ No se pudo generar la URL de autenticación")
@@ -339,7 +452,10 @@ CLIENT_SECRET: {'Configurado ✓' if CLIENT_SECRET else 'No configurado (usando
         - ✅ **Privado**: Solo accedemos a tu nombre y email
         
         ### ¿Qué permisos solicitamos?
-        - 📧 **User.Read**: Para obtener tu nombre y correo electrónico
+        - 🔑 **openid**: Para iniciar sesión con tu cuenta de Microsoft
+        - 👤 **profile**: Para obtener tu nombre
+        - 📧 **email**: Para obtener tu correo electrónico
+        - 📄 **User.Read**: Para leer tu perfil básico si el inicio de sesión no trae tu nombre o correo
         
         ### ¿Es seguro?
         Sí. Usamos OAuth 2.0, el estándar de la industria. Microsoft gestiona 
@@ -353,42 +469,33 @@ def _normalize_student_id_from_input(value: str) -> Optional[str]:
     if not value:
         return None
     v = value.strip().lower()
-    if "@" in v:
-        local = v.split("@", 1)[0]
-        m = re.fullmatch(r'([a-zA-Z]+)(2\d+)', local)
+    local, at, _ = v.partition("@")
+    if at:
+        m = _RE_STUDENT.fullmatch(local)
         if m:
             return m.group(2)
-        m2 = re.fullmatch(r'(2?\d+)', local)
-        if m2:
-            s = m2.group(1)
-            if not s.startswith("2"):
-                s = "2" + s
-            return s
-        return None
-    digits = ''.join(ch for ch in v if ch.isdigit())
-    if digits:
-        if not digits.startswith("2"):
-            digits = "2" + digits
-        return digits
-    m = re.fullmatch(r'([a-zA-Z]+)(2\d+)', v)
-    if m:
-        return m.group(2)
-    return None
+        # Sólo el código antes de la '@' (isdecimal equivale a \d+)
+        if not local.isdecimal():
+            return None
+        digits = local
+    else:
+        # Caso común (sólo números): sin pasar por la regex
+        digits = v if v.isdecimal() else _RE_NONDIGIT.sub('', v)
+        if not digits:
+            return None
+    return digits if digits.startswith("2") else "2" + digits
 
 
-def add_admins_from_codes(codes: List[str]) -> int:
+def add_admins_from_codes(codes: Iterable[str]) -> int:
     """Agrega una lista de códigos/emails como administradores."""
-    if "microsoft_admin_students" not in st.session_state:
-        st.session_state["microsoft_admin_students"] = set(DEFAULT_ADMIN_STUDENTS)
-    admins = st.session_state["microsoft_admin_students"]
-    added = 0
-    for code in codes:
-        sid = _normalize_student_id_from_input(code)
-        if sid and sid not in admins:
-            admins.add(sid)
-            added += 1
-    st.session_state["microsoft_admin_students"] = admins
-    return added
+    # Normalizar todo y unir en una sola operación de conjuntos
+    admins = get_admin_students()
+    new = {sid for code in codes if (sid := _normalize_student_id_from_input(code))}
+    new -= admins
+    if new:
+        st.session_state["microsoft_admin_students"] = admins | new
+        st.session_state.pop("_admin_list_cache", None)
+    return len(new)
 
 
 def add_admin_from_code(code: str) -> bool:
@@ -407,12 +514,19 @@ def remove_admin_by_code(code: str) -> bool:
     
     admins = get_admin_students()
     if sid in admins:
-        admins.remove(sid)
-        st.session_state["microsoft_admin_students"] = admins
+        st.session_state["microsoft_admin_students"] = admins - {sid}
+        st.session_state.pop("_admin_list_cache", None)
         return True
     return False
 
 
 def get_admin_list() -> List[str]:
-    """Retorna lista de códigos de admin"""
-    return sorted(list(get_admin_students()))
\ No newline at end of file
+    """
+    Retorna lista de códigos de admin. Se ordena una vez y se guarda en la sesión
+    hasta que se agregue o remueva un admin (no mutar la lista devuelta).
+    """
+    cached = st.session_state.get("_admin_list_cache")
+    if cached is None:
+        cached = sorted(get_admin_students())
+        st.session_state["_admin_list_cache"] = cached
+    return cached
\ No newline at end of file
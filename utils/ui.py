@@ -0,0 +1,50 @@
+"""
+Fragmentos HTML estáticos de la interfaz.
+Viven en un módulo importado (no en la página) para construirse una sola vez
+por proceso en lugar de en cada rerun de Streamlit.
+"""
+
+
+def _card(icon: str, title: str, text: str, bg: str, border: str) -> str:
+    """Tarjeta con borde de color e icono Material Symbols."""
+    return (
+        f'<div style="padding: 20px; background-color: {bg}; border-radius: 10px; border-left: 4px solid {border};">'
+        f'<h4><span class="material-symbols-outlined" style="vertical-align: middle;">{icon}</span> {title}</h4>'
+        f'<p>{text}</p>'
+        '</div>'
+    )
+
+
+_CARD_VALIDAR = _card("verified", "Validar Registros", "Ve a <b>Validación</b> para aprobar registros pendientes", "#e3f2fd", "#2196f3")
+_CARD_VER_REGISTROS = _card("list_alt", "Ver Registros", "Consulta todos los registros del sistema", "#fff3e0", "#ff9800")
+
+_DASHBOARD_CARDS = {
+    'Estudiante': (
+        _card("edit_note", "Registrar Horas", "Ve a <b>Registros</b> para reportar tus horas de extensión", "#e8f5e9", "#4caf50"),
+        _card("analytics", "Ver Estado", "Consulta tus horas validadas y pendientes", "#e3f2fd", "#2196f3"),
+    ),
+    'Empresa': (_CARD_VALIDAR, _CARD_VER_REGISTROS),
+    'Departamento': (_CARD_VALIDAR, _CARD_VER_REGISTROS),
+    'Docente': (_CARD_VALIDAR, _CARD_VER_REGISTROS),
+    'Admin': (
+        _card("groups", "Alumnos", "Gestionar catálogo de alumnos", "#e8f5e9", "#4caf50"),
+        _card("domain", "Lugares", "Gestionar empresas y lugares", "#e3f2fd", "#2196f3"),
+        _card("check_box", "Validación", "Aprobar registros pendientes", "#fff3e0", "#ff9800"),
+    ),
+}
+
+
+def _grid(cards) -> str:
+    """
+    Agrupa tarjetas en una rejilla CSS (un solo nodo en lugar de st.columns).
+    auto-fit: en pantallas angostas las tarjetas bajan de fila en vez de apretarse.
+    """
+    return (
+        "<div style='display: grid; grid-template-columns: repeat(auto-fit, minmax(240px, 1fr)); gap: 16px;'>"
+        + "".join(cards)
+        + "</div>"
+    )
+
+
+# Panel "¿Qué puedes hacer?" por rol, listo para st.html
+DASHBOARD_HTML = {rol: _grid(cards) for rol, cards in _DASHBOARD_CARDS.items()}